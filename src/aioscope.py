@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+"""asyncio front end of scope.Scope
+
+    async def station(select):
+        dev = AsyncScope(select=select)
+        waves = await dev.dual(timeout=2)
+        await dev.close()
+
+The USB calls of a scope run one at a time in a thread pool that is
+shared by all scopes, the acquisition delays are asyncio sleeps. One
+event loop drives several scopes without a thread per station.
+"""
+
+import argparse
+import asyncio
+import functools
+import time
+from collections import Counter
+from concurrent import futures
+
+import dso
+import log
+import scope
+import waveform
+from verdict import judge
+
+PARSER = argparse.ArgumentParser('aioscope')
+PARSER.add_argument('-n', '--stations', type=int, default=3,
+                    help='Simulated scopes')
+PARSER.add_argument('-t', '--time', type=float, default=5,
+                    help='Seconds to run')
+PARSER.add_argument('-l', '--latency', type=float, default=.05,
+                    help='Simulated acquisition latency (seconds)')
+
+
+USB_WORKERS = 4     # threads of the shared USB executor
+
+_executor = None
+
+
+def executor() -> futures.ThreadPoolExecutor:
+    """Thread pool shared by the scopes for the blocking USB calls"""
+
+    global _executor
+    if _executor is None:
+        _executor = futures.ThreadPoolExecutor(
+            USB_WORKERS, thread_name_prefix='usb')
+
+    return _executor
+
+
+class AsyncScope:
+    """Oscilloscope for asyncio
+A read can be cancelled or limited with timeout (seconds). The USB call
+running at that moment still completes in the executor, the next call
+of the scope waits for it."""
+
+    _lock: asyncio.Lock = None
+    _job: asyncio.Future = None
+
+    def __init__(self, verbose=False, device=None,
+                 select: dso.ScopeId = None, pool=None) -> None:
+        """device, select: see scope.Scope
+        pool: executor for the USB calls, the shared one by default"""
+
+        self.scope = scope.Scope(verbose, device=device, select=select)
+        self.latest = None  # (time.time(), waves) of the last dual read
+        self._pool = pool
+
+    async def dso_settings(self, timeout: float = None) -> dict:
+        """Read DSO settings"""
+
+        return await self._guard(self._call(self.scope.dso_settings), timeout)
+
+    async def read(self, channel: int, timeout: float = None) \
+            -> waveform.Wave:
+        """Read a single channel"""
+
+        return await self._guard(self._read(channel), timeout)
+
+    async def dual(self, timeout: float = None) -> list:
+        """Read dual channel, pipelined like scope.Scope.dual"""
+
+        return await self._guard(self._dual(), timeout)
+
+    async def alarm(self, delay: int = 1) -> None:
+        """Alarm with buzzer"""
+
+        await self._guard(self._call(self.scope.alarm, delay))
+
+    async def close(self) -> None:
+        """Close device"""
+
+        await self._guard(self._call(self.scope.close))
+
+    async def _guard(self, coro, timeout: float = None):
+        """One operation of the scope at a time"""
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()     # in the running loop
+
+        async with self._lock:
+            return await asyncio.wait_for(coro, timeout)
+
+    async def _call(self, func, *args):
+        """Run a blocking call of the scope in the executor"""
+
+        if self._job and not self._job.done():
+            await asyncio.wait([self._job])     # left by a cancelled read
+
+        loop = asyncio.get_running_loop()
+        self._job = loop.run_in_executor(
+            self._pool or executor(), functools.partial(func, *args))
+
+        return await asyncio.shield(self._job)
+
+    async def _read(self, channel: int) -> waveform.Wave:
+
+        await self._call(self.scope.ready)
+        await self._settle(channel)
+        sent = await self._call(self.scope.request, channel)
+        received = await self._receive(channel, sent)
+
+        return await self._call(self.scope.finish, received, channel)
+
+    async def _dual(self) -> list:
+
+        base = self.scope
+        base.timings = {}
+        start = time.perf_counter()
+        await self._call(base.ready)
+        await self._settle(scope.CH1)
+        sent = await self._call(base.request, scope.CH1)
+        received = await self._receive(scope.CH1, sent)
+
+        sent = await self._call(base.request, scope.CH2)
+        out = [await self._call(base.finish, received, scope.CH1)]
+        received = await self._receive(scope.CH2, sent)
+        out.append(await self._call(base.finish, received, scope.CH2))
+        base.timings['total'] = time.perf_counter() - start
+        self.latest = (time.time(), out)
+
+        return out
+
+    async def _settle(self, channel: int) -> None:
+
+        start = time.perf_counter()
+        await asyncio.sleep(self.scope.settle_wait())
+        self.scope.timings['ch{}_settle'.format(channel)] = \
+            time.perf_counter() - start
+
+    async def _receive(self, channel: int, sent: float) -> tuple:
+
+        left = self.scope.reply_wait(sent)
+        if left > 0:
+            await asyncio.sleep(left)
+
+        return await self._call(self.scope.receive, channel, sent, False)
+
+
+async def _station(dev: AsyncScope, end: float, verdicts: Counter) -> int:
+    """Dual reads until end, returns the read count"""
+
+    count = 0
+    while time.monotonic() < end:
+        try:
+            waves = await dev.dual(timeout=2)
+        except (asyncio.TimeoutError, dso.SampleLostError) as err:
+            verdicts[type(err).__name__] += 1
+            continue
+        verdicts[judge(waves).value] += 1
+        count += 1
+    await dev.close()
+
+    return count
+
+
+async def _main(stations: int, seconds: float, latency: float) -> None:
+
+    import dsosim
+
+    devs = [AsyncScope(device=dsosim.SimDevice(latency=latency, seed=idx))
+            for idx in range(stations)]
+    verdicts = Counter()
+    start = time.monotonic()
+    counts = await asyncio.gather(*[
+        _station(dev, start + seconds, verdicts) for dev in devs])
+    elapsed = time.monotonic() - start
+
+    print('{} reads in {:.1f} s, {:.2f} reads/s per station {}'.format(
+        sum(counts), elapsed, sum(counts) / elapsed / stations,
+        dict(verdicts)))
+
+
+_logger = log.setup_log('aioscope')
+
+
+if __name__ == '__main__':
+
+    ARGS = PARSER.parse_args()
+    asyncio.run(_main(ARGS.stations, ARGS.time, ARGS.latency))
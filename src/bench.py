@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+"""Benchmark of the wave form analysis
+Results are saved as JSON, compare them with --baseline to find
+regressions between versions.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import timeit
+from array import array
+
+import synth
+import waveform
+
+PARSER = argparse.ArgumentParser('bench')
+PARSER.add_argument('-n', '--sizes', type=int, nargs='+',
+                    default=[1000, 4000, 8000],
+                    help='Capture lengths (samples)')
+PARSER.add_argument('-r', '--repeat', type=int, default=5,
+                    help='Repeat count, the best one is kept')
+PARSER.add_argument('-o', '--output', help='Save results to JSON file')
+PARSER.add_argument('-b', '--baseline', help='Compare with JSON file')
+PARSER.add_argument('-t', '--threshold', type=float, default=1.2,
+                    help='Fail when slower than baseline * threshold')
+PARSER.add_argument('--io', action='store_true',
+                    help='Also time sample reads from the DSO simulator')
+PARSER.add_argument('--dual', type=int, default=0, metavar='CYCLES',
+                    help='Stages of sequential and pipelined Scope.dual')
+
+
+PERIOD = 400        # samples, 400 us/DIV setup
+DUAL_LATENCY = .05  # s, simulated acquisition
+
+# synth.capture options of the get_wave_form cases besides the plain one
+VARIANTS = {
+    'inverted': {'invert': True},
+    'low': {'amplitude': 30},
+    'phase': {'phase': 2},
+    'clipped': {'amplitude': 160, 'clip': 100},
+}
+
+
+def analysis_cases(size: int):
+    """Yield (name, function) of the analysis steps for a capture size"""
+
+    sine = synth.capture('sine', size, PERIOD, noise=10)
+    square = synth.capture('square', size, PERIOD, noise=10, seed=1)
+    signed = array('b', sine.tobytes())
+    sine_dots = waveform.get_wave_form(sine).data
+    square_dots = waveform.get_wave_form(square).data
+
+    yield 'get_wave_form', lambda: waveform.get_wave_form(sine)
+    if waveform.np is not None:
+        yield 'get_wave_form_py', lambda: waveform._get_wave_form_py(sine)
+
+    for shape in synth.SHAPES:
+        for variant, options in VARIANTS.items():
+            data = synth.capture(shape, size, PERIOD, noise=10, **options)
+            yield 'get_wave_form[{},{}]'.format(shape, variant), \
+                lambda data=data: waveform.get_wave_form(data)
+
+    def stream():
+        analyzer = waveform.WaveAnalyzer()
+        view = memoryview(sine)
+        for idx in range(0, size, 500):
+            analyzer.feed(view[idx:idx+500])
+        return analyzer.finish()
+    yield 'WaveAnalyzer', stream
+
+    yield '_average', lambda: waveform._average(signed)
+    yield 'has_signal', lambda: waveform.has_signal(sine)
+    yield 'is_top_sine_inside_top_square', \
+        lambda: waveform.is_top_sine_inside_top_square(sine_dots, square_dots)
+    yield 'top_sine_inside_top_square_ratio', \
+        lambda: waveform.top_sine_inside_top_square_ratio(
+            sine_dots, square_dots)
+
+
+def read_cases(size: int):
+    """Yield (name, function) of sample reads through dso.Dso
+The receive buffer pool is compared with a fresh buffer per read."""
+
+    for name, dev in _read_devices(size):
+        yield name, lambda dev=dev: _read_sample(dev)
+
+
+def read_allocations(size: int, count: int = 100) -> dict:
+    """Receive buffers allocated per sample read, keyed by name/size"""
+
+    out = {}
+    for name, dev in _read_devices(size):
+        _read_sample(dev)
+        allocated = dev.pool.allocated
+        for _ in range(count):
+            _read_sample(dev)
+        out['{}/{}'.format(name, size)] = \
+            (dev.pool.allocated - allocated) / count
+
+    return out
+
+
+def _read_devices(size: int):
+
+    import dso
+    import dsosim
+
+    sim = dsosim.SimDevice({0: synth.capture('sine', size, PERIOD)})
+    for pool_size in (0, dso.POOL_SIZE):
+        dev = dso.Dso(device=sim, pool_size=pool_size)
+        dev.setup()
+        yield 'Dso.get_sample[pool={}]'.format(pool_size), dev
+
+
+def _read_sample(dev):
+
+    dev.sample(0, wait=False)
+    return dev.get_sample()
+
+
+def dual_breakdown(count: int = 10, latency: float = DUAL_LATENCY) -> dict:
+    """Mean seconds per Scope.dual stage (Scope.timings) from the DSO
+simulator, keyed by sequential/pipelined"""
+
+    import dsosim
+    import scope
+
+    out = {}
+    for name, pipelined in (('sequential', False), ('pipelined', True)):
+        dev = scope.Scope(device=dsosim.SimDevice(latency=latency))
+        dev.dual(pipelined)     # reads the settings
+        totals = {}
+        for _ in range(count):
+            dev.dual(pipelined)
+            for stage, seconds in dev.timings.items():
+                totals[stage] = totals.get(stage, 0) + seconds
+        dev.close()
+        out[name] = {stage: seconds / count
+                     for stage, seconds in totals.items()}
+
+    return out
+
+
+def run(sizes: list, repeat: int = 5, io: bool = False) -> dict:
+    """Best time per call in seconds, keyed by name/size"""
+
+    out = {}
+    for size in sizes:
+        cases = list(analysis_cases(size))
+        if io:
+            cases.extend(read_cases(size))
+        for name, func in cases:
+            number, _ = timeit.Timer(func).autorange()
+            best = min(timeit.repeat(func, number=number, repeat=repeat))
+            out['{}/{}'.format(name, size)] = best / number
+
+    return out
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Names that are slower than baseline * threshold"""
+
+    return [name for name, seconds in results.items()
+            if name in baseline and seconds > baseline[name] * threshold]
+
+
+def _report() -> dict:
+
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'numpy': waveform.np.__version__ if waveform.np else None,
+    }
+
+
+if __name__ == '__main__':
+
+    ARGS = PARSER.parse_args()
+
+    RESULTS = run(ARGS.sizes, ARGS.repeat, ARGS.io)
+    for NAME, SECONDS in RESULTS.items():
+        print('{:48} {:10.1f} us'.format(NAME, SECONDS * 1e6))
+
+    ALLOCATIONS = {}
+    if ARGS.io:
+        for SIZE in ARGS.sizes:
+            ALLOCATIONS.update(read_allocations(SIZE))
+        for NAME, COUNT in ALLOCATIONS.items():
+            print('{:48} {:10.1f} buffers/read'.format(NAME, COUNT))
+
+    DUAL = {}
+    if ARGS.dual:
+        DUAL = dual_breakdown(ARGS.dual)
+        SEQ, PIPE = DUAL['sequential'], DUAL['pipelined']
+        print('{:48} {:>10} {:>10}'.format(
+            'Scope.dual stage (ms)', 'sequential', 'pipelined'))
+        for STAGE in sorted(SEQ, key=lambda name: name == 'total'):
+            print('{:48} {:10.1f} {:10.1f}'.format(
+                STAGE, SEQ[STAGE] * 1e3, PIPE.get(STAGE, 0) * 1e3))
+        print('{:48} {:10.1f} ms/cycle'.format(
+            'saved', (SEQ['total'] - PIPE['total']) * 1e3))
+
+    if ARGS.output:
+        with open(ARGS.output, 'w', encoding='utf8') as OUT:
+            json.dump({'info': _report(), 'results': RESULTS,
+                       'allocations': ALLOCATIONS, 'dual': DUAL},
+                      OUT, indent=2)
+
+    if ARGS.baseline:
+        with open(ARGS.baseline, encoding='utf8') as IN:
+            BASELINE = json.load(IN)['results']
+        SLOWER = compare(RESULTS, BASELINE, ARGS.threshold)
+        for NAME in SLOWER:
+            print('Regression {}: {:.1f} -> {:.1f} us'.format(
+                NAME, BASELINE[NAME] * 1e6, RESULTS[NAME] * 1e6))
+        if SLOWER:
+            sys.exit(1)
@@ -0,0 +1,399 @@
+#!/usr/bin/env python
+"""Capture recorder
+Every read cycle is appended to a segment file, with a side index:
+
+    <name>.seg  MAGIC and the records
+    <name>.idx  INDEX (offset, time, kind, verdict) of every record
+
+A record is a RECORD header and its payload:
+    SETTINGS    213 bytes DSO settings block, once per fingerprint
+    CAPTURE     raw unsigned samples of CH1 and CH2, delta coded and
+                zlib compressed with FLAG_ZLIB
+
+    rec = Recorder('captures')
+    rec.record(ch1, ch2, fingerprint, raw_settings, Verdict.OK)
+
+    with Segment('captures/capture-20240102-030405-000000.seg') as seg:
+        for item in seg.captures():
+            print(item.time, item.verdict, len(item.ch1))
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import time
+import zlib
+from collections import Counter
+from datetime import datetime
+from itertools import accumulate
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import log
+from verdict import Verdict
+
+PARSER = argparse.ArgumentParser('capture')
+PARSER.add_argument('segment', help='Segment file (.seg)')
+PARSER.add_argument('-l', '--list', help='Show every capture',
+                    action='store_true')
+
+
+MAGIC = b'OSCSEG1\n'
+SEGMENT_EXT = '.seg'
+INDEX_EXT = '.idx'
+SEGMENT_SIZE = 64 << 20     # bytes, then a new segment is started
+ZLIB_LEVEL = 1
+
+SETTINGS = b'S'
+CAPTURE = b'C'
+FLAG_ZLIB = 0x01
+
+# kind, flags, verdict code, time, fingerprint, payload sizes, sample counts
+RECORD = struct.Struct('<cBBxdIIIII')
+# offset, time, kind, verdict code
+INDEX = struct.Struct('<QdcB')
+
+# verdict code of the records, 0 is none. Fixed, the archived segments
+# keep their meaning when Verdict changes, a new member gets a new code.
+VERDICT_CODES = {
+    Verdict.OK: 1,
+    Verdict.NOT_SYNC: 2,
+    Verdict.LOW_VOLTAGE: 3,
+    Verdict.UNKNOWN_WAVE: 4,
+    Verdict.NO_SINE: 5,
+}
+_VERDICTS = {code: verdict for verdict, code in VERDICT_CODES.items()}
+
+
+class Recorder:
+    """Append captures to segment files in directory
+A new segment is started when the current one is larger than max_size.
+Every record is flushed, readers see it right away."""
+
+    _seg = None
+    _idx = None
+    path: str = None    # current segment
+
+    def __init__(self, directory: str, compress: bool = False,
+                 max_size: int = SEGMENT_SIZE) -> None:
+
+        self.directory = directory
+        self.compress = compress
+        self.max_size = max_size
+        self._fingerprints = set()  # settings in the current segment
+        os.makedirs(directory, exist_ok=True)
+
+    def record(self, ch1, ch2, fingerprint: int = None,
+               raw_settings=None, verdict: Verdict = None,
+               timestamp: float = None) -> None:
+        """Append a capture, the settings block goes in once"""
+
+        if not self._seg or self._seg.tell() > self.max_size:
+            self._open()
+
+        if timestamp is None:
+            timestamp = time.time()
+        fingerprint = fingerprint or 0
+
+        if raw_settings is not None \
+                and fingerprint not in self._fingerprints:
+            self._fingerprints.add(fingerprint)
+            self._append(SETTINGS, 0, None, timestamp, fingerprint,
+                         (bytes(raw_settings), b''), (len(raw_settings), 0))
+
+        counts = (len(ch1), len(ch2))
+        flags = 0
+        data = (ch1, ch2)
+        if self.compress:
+            flags |= FLAG_ZLIB
+            data = (_pack(ch1), _pack(ch2))
+        self._append(CAPTURE, flags, verdict, timestamp, fingerprint,
+                     data, counts)
+
+        self._seg.flush()
+        self._idx.flush()
+
+    def close(self) -> None:
+        """Close the current segment"""
+
+        for outfile in (self._seg, self._idx):
+            if outfile:
+                outfile.close()
+        self._seg, self._idx = None, None
+
+    def __enter__(self) -> 'Recorder':
+
+        return self
+
+    def __exit__(self, *_exc) -> None:
+
+        self.close()
+
+    def _open(self) -> None:
+
+        self.close()
+        name = datetime.now().strftime('capture-%Y%m%d-%H%M%S-%f')
+        self.path = os.path.join(self.directory, name + SEGMENT_EXT)
+        self._seg = open(self.path, 'ab')
+        if self._seg.tell() == 0:
+            self._seg.write(MAGIC)
+        self._idx = open(_index_path(self.path), 'ab')
+        self._fingerprints = set()
+        _logger.info("segment %s", self.path)
+
+    def _append(self, kind: bytes, flags: int, verdict: Verdict,
+                timestamp: float, fingerprint: int, data: tuple,
+                counts: tuple) -> None:
+
+        code = VERDICT_CODES[verdict] if verdict else 0
+        offset = self._seg.tell()
+        self._seg.write(RECORD.pack(
+            kind, flags, code, timestamp, fingerprint,
+            len(data[0]), len(data[1]), counts[0], counts[1]))
+        self._seg.write(data[0])
+        self._seg.write(data[1])
+        self._idx.write(INDEX.pack(offset, timestamp, kind, code))
+
+
+class Record:
+    """Record of a segment
+It holds the payload offsets only, ch1, ch2 and settings are views into
+the mapped segment, the compressed samples are decoded on access."""
+
+    __slots__ = ('kind', 'flags', 'verdict', 'time', 'fingerprint',
+                 '_segment', '_spans', '_counts')
+
+    def __init__(self, header: tuple, segment: 'Segment',
+                 spans: tuple) -> None:
+
+        kind, flags, code, timestamp, fingerprint, _, _, count1, count2 \
+            = header
+        self.kind = kind
+        self.flags = flags
+        self.verdict = _VERDICTS.get(code)
+        self.time = timestamp
+        self.fingerprint = fingerprint
+        self._segment = segment
+        self._spans = spans     # (begin, end) of the payloads
+        self._counts = (count1, count2)
+
+    @property
+    def ch1(self):
+        """CH1 unsigned samples"""
+
+        return self._samples(0)
+
+    @property
+    def ch2(self):
+        """CH2 unsigned samples"""
+
+        return self._samples(1)
+
+    @property
+    def settings(self) -> memoryview:
+        """Raw settings block of a SETTINGS record"""
+
+        return self._segment.view(*self._spans[0])
+
+    def _samples(self, idx: int):
+
+        data = self._segment.view(*self._spans[idx])
+        if self.flags & FLAG_ZLIB:
+            with data:
+                return _unpack(data, self._counts[idx])
+
+        return data
+
+    def __repr__(self) -> str:
+
+        return 'Record(kind={}, verdict={}, time={}, fingerprint={:08x})' \
+            .format(self.kind, self.verdict, self.time, self.fingerprint)
+
+
+class Segment:
+    """Read a segment through mmap
+The payloads of the records are views into the map, release them (or
+drop every reference) before close()."""
+
+    def __init__(self, path: str) -> None:
+
+        self.path = path
+        self._settings = {}     # fingerprint: span of the raw block
+        self._offsets = None
+        with open(path, 'rb') as infile:
+            self._map = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        if self._view[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError('Not a capture segment {}'.format(path))
+
+    def __iter__(self):
+        """Every complete record in file order"""
+
+        offset = len(MAGIC)
+        while True:
+            item = self._read(offset)
+            if item is None:
+                break
+            record, offset = item
+            yield record
+
+    def __len__(self) -> int:
+
+        return len(self.offsets)
+
+    def __getitem__(self, idx: int) -> Record:
+
+        return self._read(self.offsets[idx])[0]
+
+    @property
+    def offsets(self) -> list:
+        """Record offsets from the index, or from a scan without it
+The settings blocks of the segment are collected on the way."""
+
+        if self._offsets is None:
+            self._offsets = self._index() or self._scan()
+
+        return self._offsets
+
+    def view(self, begin: int, end: int) -> memoryview:
+        """Bytes begin:end of the segment, without a copy"""
+
+        return self._view[begin:end]
+
+    def captures(self):
+        """CAPTURE records"""
+
+        return (record for record in self if record.kind == CAPTURE)
+
+    def settings(self, fingerprint: int) -> memoryview:
+        """Raw settings block of a fingerprint, None when unknown
+The blocks are looked up once, with the offsets."""
+
+        if fingerprint not in self._settings and self._offsets is None:
+            self._offsets = self._index() or self._scan()
+        span = self._settings.get(fingerprint)
+
+        return self.view(*span) if span else None
+
+    def close(self) -> None:
+        """Unmap the segment
+Raises BufferError while a payload view is still referenced, the segment
+stays open (locked on Windows) until it is released and closed again."""
+
+        try:
+            self._view.release()
+            self._map.close()
+        except BufferError as err:
+            raise BufferError('{}: payload views still in use'.format(
+                self.path)) from err
+
+    def __enter__(self) -> 'Segment':
+
+        return self
+
+    def __exit__(self, *_exc) -> None:
+
+        self.close()
+
+    def _read(self, offset: int) -> tuple:
+        """(record, next offset), None at the end or a cut record"""
+
+        end = offset + RECORD.size
+        if end > len(self._view):
+            return None
+
+        header = RECORD.unpack_from(self._view, offset)
+        size1, size2 = header[5], header[6]
+        if end + size1 + size2 > len(self._view):
+            return None
+
+        spans = ((end, end + size1), (end + size1, end + size1 + size2))
+        record = Record(header, self, spans)
+        if record.kind == SETTINGS:
+            self._settings[record.fingerprint] = spans[0]
+
+        return record, end + size1 + size2
+
+    def _index(self) -> list:
+
+        path = _index_path(self.path)
+        if not os.path.exists(path):
+            return None
+
+        with open(path, 'rb') as infile:
+            data = infile.read()
+        offsets = [INDEX.unpack_from(data, idx * INDEX.size)[0]
+                   for idx in range(len(data) // INDEX.size)]
+
+        return [offset for offset in offsets if self._read(offset)]
+
+    def _scan(self) -> list:
+
+        out = []
+        offset = len(MAGIC)
+        while True:
+            item = self._read(offset)
+            if item is None:
+                return out
+            out.append(offset)
+            offset = item[1]
+
+
+def _index_path(path: str) -> str:
+
+    return os.path.splitext(path)[0] + INDEX_EXT
+
+
+def _pack(samples) -> bytes:
+    """Delta code and compress unsigned samples"""
+
+    if np is not None:
+        data = np.frombuffer(samples, np.uint8)
+        delta = data.copy()
+        delta[1:] -= data[:-1]     # wraps around like the byte arithmetic
+        return zlib.compress(delta.tobytes(), ZLIB_LEVEL)
+
+    data = bytes(samples)
+    delta = bytes((val - prev) & 0xFF
+                  for prev, val in zip(b'\0' + data, data))
+
+    return zlib.compress(delta, ZLIB_LEVEL)
+
+
+def _unpack(data, count: int) -> bytes:
+    """Samples of _pack"""
+
+    delta = zlib.decompress(data, bufsize=max(count, 1))
+    if np is not None:
+        return np.cumsum(np.frombuffer(delta, np.uint8),
+                         dtype=np.uint8).tobytes()
+
+    return bytes(accumulate(delta, lambda prev, val: (prev + val) & 0xFF))
+
+
+_logger = log.setup_log('capture')
+
+
+if __name__ == '__main__':
+
+    ARGS = PARSER.parse_args()
+
+    with Segment(ARGS.segment) as SEG:
+        COUNT = Counter()
+        for REC in SEG.captures():
+            COUNT[REC.verdict.name if REC.verdict else None] += 1
+            if ARGS.list:
+                print('{} {:12} CH1:{} CH2:{} {:08x}'.format(
+                    datetime.fromtimestamp(REC.time).strftime(
+                        '%Y-%m-%d %H:%M:%S.%f'),
+                    REC.verdict.name if REC.verdict else '-',
+                    len(REC.ch1), len(REC.ch2), REC.fingerprint))
+
+    print('Total: {}'.format(sum(COUNT.values())))
+    for KEY, VAL in COUNT.most_common():
+        print('  {}: {}'.format(KEY, VAL))
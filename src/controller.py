@@ -4,24 +4,22 @@ import gc
 import os
 import sys
 import threading
+import time
 import traceback
 from datetime import datetime
 
-import tkinter as tk
-from tkinter import messagebox  # submodules
-
-import usb
+import capture
 import dso
 import log
+import runner
 import scope
-import waveform
 from ng_state import NgState
+from verdict import Verdict, judge
 
 if os.name == 'nt':
     import winsound
 
 
-MIN_VOLT_P2P = 2.5      # volts
 POLLING_TIME = 500      # in milliseconds
 OK_SINGLE_TIME = 1000   # in milliseconds
 SINGLE_READ_TRY_COUNT = 6
@@ -36,27 +34,52 @@ class Controller:
     _cb = None
     _single_read_try_count = 0
     _scope: scope.Scope = None
-
-    def __init__(self):
-        self._scope = scope.Scope(verbose=False)
+    _session = 0    # counts Start / Stop, results of old reads are dropped
+    _revalidate_error: Exception = None     # raised by the next read
+
+    def __init__(self, device=None, job_runner=None, recorder=None,
+                 reader=None):
+        """job_runner: runs the scope calls, see runner.py. By default a
+        ThreadRunner when the callbacks have 'after' (e.g. Tk.after),
+        otherwise an InlineRunner.
+        recorder: capture.Recorder of every cycle, by default one in the
+        OSCILOK_CAPTURE_DIR environment variable directory when it is set
+        (OSCILOK_CAPTURE_ZLIB=1 compresses the samples)
+        reader: used instead of a scope.Scope on device, e.g. a
+        replay.ReplayScope playing recorded captures"""
+
+        self._scope = reader or scope.Scope(verbose=False, device=device)
+        self._runner = job_runner
+        self._recorder = recorder
+        directory = os.getenv('OSCILOK_CAPTURE_DIR')
+        if recorder is None and directory:
+            self._recorder = capture.Recorder(
+                directory, compress=os.getenv('OSCILOK_CAPTURE_ZLIB') == '1')
 
     def set_callbacks(self, callbacks):
         """Set callbacks to GUI"""
 
         self._cb = callbacks
+        if self._runner is None:
+            if 'after' in callbacks:
+                self._runner = runner.ThreadRunner(callbacks['after'])
+            else:
+                self._runner = runner.InlineRunner()
 
     def toggle(self, _event=None):
         """Toggle reading"""
 
         self._ok_count = 0
         self._ng_count = 0
+        self._session += 1
+        self._revalidate_error = None
 
         if self.polling:
             self.polling = False
             self._cb['ng'](NgState.STOP)
             self._cb['reading']("Start")
             self._cb['disable_buttons'](False)
-            self._scope.close()
+            self._runner.submit(self._scope.close)
             return
 
         self.polling = True
@@ -82,9 +105,27 @@ class Controller:
         if not self.polling:
             return
 
+        session = self._session
+        if self._revalidate_error:
+            error, self._revalidate_error = self._revalidate_error, None
+            self._read_done(session, None, error)
+            return
+
+        self._runner.submit(
+            self._scope.dual,
+            lambda data, error: self._read_done(session, data, error))
+
+    def _read_done(self, session: int, data: list, error: Exception) -> None:
+        """Reading result, in the mainloop"""
+
+        if not self.polling or session != self._session:
+            return  # stopped while reading
+
         try:
 
-            data = self._scope.dual()
+            if error:
+                raise error
+            self._revalidate_error = None   # the device works again
 
             for chan, wave in enumerate(data):
                 if not wave.data:
@@ -115,10 +156,37 @@ class Controller:
             self._cb['ng'](NgState.STOP).after(POLLING_TIME, self._reading)
 
             self._clear_single_count()
-            self._scope.close()
+            self._runner.submit(self._scope.close)
             return
 
-        except usb.core.USBTimeoutError as err:
+        except Exception as err:
+            if not self._usb_error(err):
+                raise
+            return
+
+        self._check_wave(data)
+        # settings, while waiting for next read
+        self._runner.submit(
+            self._scope.revalidate,
+            lambda _changed, error: self._revalidate_done(session, error))
+
+    def _revalidate_done(self, session: int, error: Exception) -> None:
+        """Settings check result, an error goes the way of a read error
+with the next read"""
+
+        if error and session == self._session:
+            _logger.warning("revalidate %r", error)
+            self._revalidate_error = error
+
+    def _usb_error(self, err: Exception) -> bool:
+        """Handle a pyusb error of _read_done, False for other errors"""
+
+        try:
+            import usb  # loaded by dso already, when there is a USB error
+        except ImportError:
+            return False
+
+        if isinstance(err, usb.core.USBTimeoutError):
             #
             # libusb0-dll:err [_usb_reap_async] timeout error
             #
@@ -129,23 +197,26 @@ class Controller:
             self._cb['disable_buttons'](False)
 
             self._clear_single_count()
-            self._scope.close()
-            return
+            self._runner.submit(self._scope.close)
+            return True
 
-        except usb.core.NoBackendError as err:
+        if isinstance(err, usb.core.NoBackendError):
             _logger.error(err)
-            messagebox.showerror("Device Error", err)
+            self._error("Device Error", err)
             sys.exit()
 
-        except usb.core.USBError as err:
+        if isinstance(err, usb.core.USBError):
             _logger.error(traceback.format_exc())
-            try:
-                messagebox.showerror("Device Error", err)
-            except tk.TclError as tkerr:
-                _logger.error(tkerr)
+            self._error("Device Error", err)
             sys.exit()
 
-        self._check_wave(data)
+        return False
+
+    def _error(self, title: str, err: Exception) -> None:
+        """Error dialog of the GUI, when it has one"""
+
+        if 'error' in self._cb:
+            self._cb['error'](title, err)
 
     def _check_wave(self, data: list) -> None:
         """Analyze wave form"""
@@ -158,42 +229,62 @@ class Controller:
             channels.append(text)
         self._cb['channels'](channels)
 
-        sine, square = None, None
-        for wave in data:
-            if wave.typ == waveform.WaveType.UNKNOWN:
-                # unknown wave form, get sample again
-                self._ng_count = 0
-                self._ok_count = 0
-                if self._single_read_count():
-                    return
-                self._inprogress()
+        result = judge(data)
+        self._record(data, result)
+        if result == Verdict.UNKNOWN_WAVE:
+            # unknown wave form, get sample again
+            self._ng_count = 0
+            self._ok_count = 0
+            if self._single_read_count():
                 return
+            self._inprogress()
+            return
 
-            if wave.typ == waveform.WaveType.SINE:
-                sine = wave.data
-
-                if wave.vpp and wave.vpp < MIN_VOLT_P2P:
-                    self._ng()
-                    self._cb['device']('Low voltage')
-                    return
-
-            elif wave.typ == waveform.WaveType.SQUARE:
-                square = wave.data
+        if result == Verdict.LOW_VOLTAGE:
+            self._ng()
+            self._cb['device'](result.value)
+            return
 
-        if not sine:
+        if result == Verdict.NO_SINE:
             if self._single_read_count():
                 return
             self._inprogress()
             return
 
-        if not waveform.is_top_sine_inside_top_square(sine, square):
-            self._cb['device']('Not Sync')
+        if result == Verdict.NOT_SYNC:
+            self._cb['device'](result.value)
             self._ng()
             return
 
         # Good result
         self._ok()
 
+    def _record(self, data: list, result: Verdict) -> None:
+        """Record the cycle on the runner, between the reads"""
+
+        if not self._recorder or any(wave.raw is None for wave in data):
+            return
+
+        raw = [wave.raw for wave in data]
+        stamp = time.time()
+        recorder = self._recorder
+        self._runner.submit(
+            lambda: recorder.record(raw[0], raw[1],
+                                    *self._scope.settings_block,
+                                    verdict=result, timestamp=stamp),
+            lambda _result, error: self._record_done(recorder, error))
+
+    def _record_done(self, recorder, error: Exception) -> None:
+        """A recording error (e.g. a full disk) stops the recording"""
+
+        if not error or recorder is not self._recorder:
+            return
+
+        _logger.error("recording stopped: %r", error)
+        self._recorder = None
+        self._runner.submit(recorder.close)
+        self._error("Recording Error", error)
+
     def _clear_single_count(self) -> None:
         """Clear single count"""
 
@@ -269,7 +360,7 @@ class Controller:
             return
 
         delay = 1 if result_ok else 10
-        self._scope.alarm(delay)
+        self._runner.submit(lambda: self._scope.alarm(delay))
 
 
 def _beep_thread(result_ok: bool) -> None:
@@ -14,20 +14,27 @@ or Itsy (experimental) (Compaq Computer Corp.)
 """
 
 import argparse
+import io
 import os
+import queue
+import threading
 import time
 from array import array
+from collections import deque
+from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
 
-import usb
-
 import message
 import log
 
 PARSER = argparse.ArgumentParser('DSO')
 PARSER.add_argument('-b', '--buzzer', help='Buzzer n * 100ms', type=int)
 PARSER.add_argument('-e', '--echo', help='echo command')
+PARSER.add_argument('-f', '--file', nargs=2, metavar=('DSO_PATH', 'OUTPUT'),
+                    help='Download a file')
+PARSER.add_argument('-p', '--screenshot', metavar='OUTPUT',
+                    help='Download a screenshot')
 PARSER.add_argument('-k', '--key', type=int, help='Keypress trigger')
 PARSER.add_argument('-l', '--lock', help='Lock panel', action='store_true')
 PARSER.add_argument('-T', '--set_time', help='Set system time (now)',
@@ -42,6 +49,18 @@ PARSER.add_argument('-v', '--verbose', help='verbose', action='store_true')
 
 VENDOR = 0x049f
 PRODUCT = 0x505a
+READ_SIZE = 4096
+POOL_SIZE = 4       # receive buffers
+READ_TIMEOUT = 1000     # ms, pyusb default
+POLL_TIMEOUT = 100      # ms, a read polling for a reply
+SAMPLE_DELAY = .12      # s, acquisition (0.1 sec gets error)
+ECHO_DELAY = .06        # s, after echo
+MIN_DELAY = .01         # s, shortest learnt delay
+LATENCY_MARGIN = .02    # s, the reply is polled for this long at least
+# echo, lock, keypress and system time replies nobody waits for
+ACKNOWLEDGES = (0x80, 0x92, 0x93, 0x94)
+MAX_SKIPPED = 8         # acknowledges skipped by _read_expect
+FILE_NOT_FOUND = 0x01   # download status
 
 
 class SampleLostError(Exception):
@@ -49,6 +68,125 @@ class SampleLostError(Exception):
     channel: int = None
 
 
+class DownloadError(ValueError):
+    """File or screenshot download failed"""
+    status: int = None  # of the 0x00 status reply
+
+
+class BufferPool:
+    """Preallocated receive buffers
+A buffer is borrowed with acquire() and given back with release(). Give
+it back only when no Message built on it is used anymore. A buffer that
+is never given back is garbage collected and replaced by a new one."""
+
+    def __init__(self, count: int = POOL_SIZE, size: int = READ_SIZE):
+
+        self.size = size
+        self.allocated = 0      # buffers created, for benchmarks
+        self._count = count
+        self._free = [self._new() for _ in range(count)]
+
+    def acquire(self, size: int = READ_SIZE) -> array:
+        """Borrow a buffer, its content is not cleared
+Parse only the bytes of the last read, e.g. memoryview(buf)[:count]."""
+
+        if size == self.size and self._free:
+            return self._free.pop()
+
+        return self._new(size)
+
+    def release(self, buf: array) -> None:
+        """Give a buffer back"""
+
+        if len(buf) == self.size and len(self._free) < self._count:
+            self._free.append(buf)
+
+    def _new(self, size: int = None) -> array:
+
+        self.allocated += 1
+        return array('B', [0]) * (size or self.size)
+
+
+@dataclass(frozen=True)
+class ScopeId:
+    """USB position and serial number of a DSO, None matches any
+The position does not matter for a DSO with a serial number."""
+
+    bus: int = None
+    address: int = None
+    serial: str = None
+
+    def __str__(self) -> str:
+
+        if self.serial:
+            return self.serial
+
+        return '{}-{}'.format(self.bus, self.address)
+
+
+def find_scopes() -> list:
+    """ScopeId of every connected DSO"""
+
+    devs = _usb().core.find(find_all=True, idVendor=VENDOR, idProduct=PRODUCT)
+
+    return [ScopeId(dev.bus, dev.address, _serial(dev)) for dev in devs]
+
+
+class AdaptiveDelay:
+    """Wait before reading a reply, learnt per key (e.g. SecDIV)
+After the wait the reply is polled with short read timeouts, so the
+time of its first packet is the reply latency. The wait follows the
+averaged latency, margin seconds before it, and never goes below the
+reply time to probe for a failure. A wait without a latency to follow
+(e.g. a settle time) is shortened by step after every reliable read.
+A failed read goes back to the default, from then on the delay stays
+above the one that failed."""
+
+    def __init__(self, default: float, minimum: float = MIN_DELAY,
+                 step: float = .8, margin: float = LATENCY_MARGIN) -> None:
+
+        self.default = default
+        self.minimum = minimum
+        self.step = step
+        self.margin = margin
+        self.latency = {}   # seconds from request to the first reply packet
+        self._delay = {}
+        self._floor = {}
+
+    def delay(self, key=None) -> float:
+        """Seconds to wait"""
+
+        return max(self._delay.get(key, self.default),
+                   self._floor.get(key, self.minimum))
+
+    def wait(self, since: float, key=None) -> None:
+        """Sleep until the delay after since (time.perf_counter)"""
+
+        left = since + self.delay(key) - time.perf_counter()
+        if left > 0:
+            time.sleep(left)
+
+    def success(self, key=None, latency: float = None) -> None:
+        """The read after the delay was reliable, latency: seconds from the
+request to the first reply packet"""
+
+        if latency is None:
+            delay = self.delay(key) * self.step
+        else:
+            average = self.latency.get(key, latency)
+            self.latency[key] = average + (latency - average) / 4
+            delay = min(self.default, self.latency[key] - self.margin)
+        self._delay[key] = max(delay, self._floor.get(key, self.minimum))
+
+    def failure(self, key=None) -> None:
+        """The read after the delay failed"""
+
+        if self.delay(key) < self.default:
+            self._floor[key] = min(self.default, self.delay(key) / self.step)
+        self._delay[key] = self.default
+        self.latency.pop(key, None)
+
+
 class Key(Enum):
     """0x13 Keypress trigger"""
 
@@ -61,16 +199,39 @@ class Key(Enum):
     CH2MENU = 30
 
 
+# Keys that may change the settings, there are no VOLT/DIV and SEC/DIV
+# knob codes, turning a knob on the panel is not seen here
+SETTINGS_KEYS = (Key.AUTOSET, Key.CH1MENU, Key.CH2MENU)
+
+
 class Dso:
     """Oscilloscope device (USB)"""
 
     error: str
     _interface, _inbound, _outbound = 0, 0, 0
     _dev = None
+    _reader: threading.Thread = None
+    _echo_sent = 0.     # time.perf_counter()
+    reply_time = 0.     # time.perf_counter() of the last first sample reply
 
-    def __init__(self, verbose=False):
+    def __init__(self, verbose=False, device=None, pool_size=POOL_SIZE,
+                 threaded=False, select: ScopeId = None):
+        """device: pyusb like device to use instead of the USB one,
+        e.g. dsosim.SimDevice
+        threaded: read the device in a background thread, see start_reader
+        select: the DSO to open when there are several, see find_scopes"""
 
         self._verbose = verbose
+        self._device = device
+        self._select = select
+        self._threaded = threaded
+        self.pool = BufferPool(pool_size)
+        self.echo_delay = AdaptiveDelay(ECHO_DELAY)
+        self.settings_epoch = 0     # counts SETTINGS_KEYS presses
+        self._messages = queue.Queue()
+        self._stop = threading.Event()
+        self._decoder = message.StreamDecoder()
+        self._pending = deque()     # decoded messages not read yet
 
     def setup(self):
         """Setup USB device"""
@@ -78,7 +239,10 @@ class Dso:
         if self._dev:
             return
 
-        self._dev = usb.core.find(idVendor=VENDOR, idProduct=PRODUCT)
+        if self._device:
+            self._dev = self._device
+        else:
+            self._dev = _find(self._select)
         if not self._dev:
             self.error = 'Device Not Found'
             return
@@ -88,72 +252,196 @@ class Dso:
         self._outbound = intf[0]    # 0x02
         self._inbound = intf[1]     # 0x81
 
-        if os.name == 'nt':
-            self._dev.set_configuration()
-        else:
-            if self._dev.is_kernel_driver_active(self._interface):
-                self._dev.detach_kernel_driver(self._interface)
-        usb.util.claim_interface(self._dev, self._interface)
+        if not self._device:    # no interface to claim for the injected one
+            if os.name == 'nt':
+                self._dev.set_configuration()
+            else:
+                if self._dev.is_kernel_driver_active(self._interface):
+                    self._dev.detach_kernel_driver(self._interface)
+            _usb().util.claim_interface(self._dev, self._interface)
+
+        if self._threaded:
+            self.start_reader()
+
+    def start_reader(self) -> None:
+        """Read the 0x81 endpoint in a background thread
+The thread decodes the received bytes into messages and queues them for
+_read_expect, get_sample and read_message. A USB timeout blocks the
+thread only, the caller waits for the queue up to its own deadline.
+A USB error stops the thread, every read after it raises the error.
+Queued messages own their data, release() is harmless but not needed."""
+
+        if self._reader or not self._dev:
+            return
+
+        self._stop.clear()
+        self._messages = queue.Queue()
+        self._reader = threading.Thread(
+                target=self._read_loop, name='dso-reader', daemon=True)
+        self._reader.start()
+
+    def stop_reader(self) -> None:
+        """Stop the background reader"""
+
+        if not self._reader:
+            return
+
+        self._stop.set()
+        self._reader.join()
+        self._reader = None
 
     def read_file(self, filepath: str) -> bytes:
         """Read content from file"""
 
-        send = message.Message(command=0x10)
-        send.data.frombytes(bytes(filepath, 'ascii'))
-        self._write(send)
+        out = io.BytesIO()
+        self.download_file(filepath, out)
+
+        return out.getvalue()
+
+    def download_file(self, filepath: str, sink, progress=None) -> int:
+        """0x10 Read file
+The content is written to sink (file like) as it arrives,
+progress(bytes) is called after every chunk. Returns the size.
+Raises FileNotFoundError for the 0x01 status, nothing is written then."""
+
+        send = message.Message(command=0x10, subcommand=0x00,
+                               data=array('B', bytes(filepath, 'ascii')))
 
-        msg = self._read()
-        data = msg.data
-        if len(data) == 1 and data[0] == 0x00:
-            data.pop(0)
+        try:
+            return self._download(send, sink, progress)
+        except DownloadError as err:
+            if err.status == FILE_NOT_FOUND:
+                raise FileNotFoundError(filepath) from err
+            raise
+
+    def download_screenshot(self, sink, progress=None) -> int:
+        """0x20 Screenshot
+Like download_file"""
+
+        return self._download(message.Message(command=0x20), sink, progress)
+
+    def _download(self, send: message.Message, sink, progress=None) -> int:
+        """Stream the 0x01 data chunks of the response to sink
+The last byte of all is the check sum, it is held back until the
+0x02 end message. A 0x00 status other than 0x00 raises DownloadError
+after the end message."""
 
-        while msg.subcommand != 0x02:
+        response = send.command | 0x80
+        self._write(send)
+
+        summary = message.Checksum()
+        size = 0
+        last = None
+        first = True
+        status = 0x00
+        while True:
             msg = self._read()
-            data.extend(msg.data)
+            if not msg:
+                _logger.error('Download Lost')
+                raise ValueError("Download Lost ({})".format(size))
+            if msg.command != response:
+                _logger.info("_download ignored %s", msg)
+                self.release(msg)
+                continue
 
-        checksum = data.pop()
-        if message.make_sum(data) != checksum:
+            chunk = msg.data or b''
+            if first and msg.subcommand == 0x00 and len(chunk) == 1:
+                status = chunk[0]
+                chunk = chunk[1:]
+            first = False
+
+            if len(chunk) > 0:
+                if last is not None:
+                    sink.write(bytes((last,)))
+                    summary.update((last,))
+                    size += 1
+                sink.write(chunk[:-1])
+                summary.update(chunk[:-1])
+                size += len(chunk) - 1
+                last = chunk[-1]
+            end = msg.subcommand == 0x02
+            self.release(msg)
+
+            if progress and not status:
+                progress(size)
+            if end:
+                break
+
+        if status:
+            _logger.error('Download status 0x%02x', status)
+            err = DownloadError('Download status 0x{:02x}'.format(status))
+            err.status = status
+            raise err
+
+        if summary.digest() != last:
             _logger.error('File Checksum Error')
             raise ValueError("File Checksum Error ({} / {})".format(
-                checksum, len(data)))
+                last, size))
 
-        return data.tobytes()
+        return size
 
-    def sample(self, chan: int) -> None:
+    def sample(self, chan: int, wait: bool = True) -> None:
         """Request sample data"""
 
         send = message.Message(command=0x02, subcommand=0x01,
                                data=array('B', [chan]))
 
         self._write(send)
-        time.sleep(.12)     # delay for acquisition (0.1 sec will get error)
-
-    def get_sample(self):
-        """Get sample data"""
-
-        msg = self._read_expect(command=message.SAMPLE_RESPONSE_CMD)
+        if wait:
+            time.sleep(SAMPLE_DELAY)
+
+    def get_sample(self, analyzer=None, t_out_ms: int = None):
+        """Get sample data
+Every data chunk is also fed to the analyzer (waveform.WaveAnalyzer)
+while the transfer is still going on. t_out_ms limits the whole
+transfer, the data received until then is returned."""
+
+        if analyzer:
+            analyzer.reset()
+
+        deadline = _deadline(t_out_ms)
+        msg = self._read_expect(command=message.SAMPLE_RESPONSE_CMD,
+                                t_out_ms=t_out_ms)
+        self.reply_time = time.perf_counter()
         if self._verbose:
             print(_read_sample_data_length(msg))
 
         chan = -2
         data = array('B')
+        summary = message.Checksum()
         if not msg or not msg.data:
+            self.release(msg)
             return data, chan
 
         if msg.command == message.SAMPLE_RESPONSE_CMD:
             chan = msg.data[0]
 
         if msg.subcommand == message.SAMPLE_DATA_SUBCMD:
-            data.extend(msg.data[1:])
+            chunk = msg.data[1:]
+            data.frombytes(chunk)
+            summary.update(chunk)
+            if analyzer:
+                analyzer.feed(chunk)
+        self.release(msg)
 
         while msg and msg.command == message.SAMPLE_RESPONSE_CMD \
                 and msg.subcommand not in [
                 message.SAMPLE_SUM_SUBCMD, message.SAMPLE_STOP_SUBCMD]:
-            msg = self._read()
+            msg = self._read(t_out_ms=_remaining(deadline))
             if msg and msg.data \
                     and msg.subcommand == message.SAMPLE_DATA_SUBCMD:
-                data.extend(msg.data[1:])
+                chunk = msg.data[1:]
+                data.frombytes(chunk)
+                summary.update(chunk)
                 chan = msg.data[0]
+                if analyzer:
+                    analyzer.feed(chunk)
+            elif msg and msg.subcommand == message.SAMPLE_SUM_SUBCMD \
+                    and msg.data and len(msg.data) > 1 \
+                    and msg.data[1] != summary.digest():
+                _logger.warning("sample checksum %d != %d (%d)",
+                                msg.data[1], summary.digest(), len(data))
+            self.release(msg)
 
         return data, chan
 
@@ -194,6 +482,8 @@ Lets you simulate the press of nearly any button on the DSO's control panel"""
 
         send = message.Message(command=0x13, data=array('B', [key.value, 1]))
         self._write(send)
+        if key in SETTINGS_KEYS:
+            self.settings_epoch += 1
 
         self.echo()
 
@@ -211,7 +501,8 @@ All data bytes in the request are simply returned unchanged."""
         if self._verbose:
             print("echo {}".format(send))
         self._write(send)
-        time.sleep(.06)
+        self._echo_sent = time.perf_counter()
+        self.echo_delay.wait(self._echo_sent)
 
     def buzzer(self, duration: int) -> None:
         """0x44 DSO Buzzer (debug)
@@ -255,33 +546,49 @@ To current time"""
 
         msg = self._read_expect(command=message.SETTINGS_RESPONSE_CMD)
         if not msg:
+            self.echo_delay.failure()
             raise SampleLostError()
 
         if msg.command != 0x81:
             _logger.info('No settings response: %s', msg)
+            self.echo_delay.failure()
             raise SampleLostError()
 
-        return msg.data
+        self.echo_delay.success(
+            latency=time.perf_counter() - self._echo_sent)
+        data = array('B', msg.data)
+        self.release(msg)
+
+        return data
 
     def close(self) -> None:
         """Release USB device"""
 
+        self.stop_reader()
+        self._decoder.reset()
+        self._pending.clear()
         if self._dev:
-            usb.util.release_interface(self._dev, self._interface)
-            usb.util.dispose_resources(self._dev)
+            if not self._device:
+                _usb().util.release_interface(self._dev, self._interface)
+                _usb().util.dispose_resources(self._dev)
             self._dev = None
             _logger.info("close")
 
     def _read_expect(self, command: int = None,
                      mark: int = message.NORMAL_MESSAGE_MARKER,
-                     data: array = None) -> message.Message:
+                     data: array = None,
+                     t_out_ms: int = None) -> message.Message:
 
-        last_msg = None
+        deadline = _deadline(t_out_ms)
+        last_msg, msg = None, None
         try_count = 2
+        skipped = 0
         while try_count > 0:
             try_count -= 1
 
-            msg = self._read()
+            if msg is not last_msg:
+                self.release(msg)
+            msg = self._read(t_out_ms=_remaining(deadline))
             if not msg:
                 _logger.info("_read_expect empty")
                 self.settings_request()
@@ -291,10 +598,14 @@ To current time"""
                 _logger.info("_read_expect wrong mark %s", msg)
                 continue
 
+            self.release(last_msg)
             last_msg = msg
 
             if command and msg.command != command:
                 _logger.info("_read_expect %d ignored %s", command, msg)
+                if msg.command in ACKNOWLEDGES and skipped < MAX_SKIPPED:
+                    skipped += 1
+                    try_count += 1  # a left over, does not count as a try
                 continue
 
             if data and msg.data != data:
@@ -306,31 +617,115 @@ To current time"""
         if not msg and last_msg:
             return last_msg
 
+        if last_msg is not msg:
+            self.release(last_msg)
+
         return msg
 
-    def read_message(self) -> message.Message:
-        """Read a message"""
+    def read_message(self, t_out_ms: int = None) -> message.Message:
+        """Read a message
+The message data points into a pooled receive buffer, call release()
+when it is not needed anymore, or just drop it."""
+
+        return self._read(t_out_ms=t_out_ms)
 
-        return self._read()
+    def release(self, msg: message.Message) -> None:
+        """Give the receive buffer of a message back to the pool
+The message data is released too, so a late access raises ValueError
+instead of reading a recycled buffer."""
+
+        if not msg or not isinstance(msg.data, memoryview):
+            return
 
-    def _read(self, size=4096, t_out_ms=None) -> message.Message:
+        buf = msg.data.obj
+        msg.data.release()
+        msg.data = None
+        self.pool.release(buf)
+
+    def _read(self, size=READ_SIZE, t_out_ms=None) -> message.Message:
         #
         # code /home/berm/.local/lib/python3.10/site-packages/usb/
         # https://stackoverflow.com/questions/26526217/why-cant-i-call-the-pyusb-function-dev-read-repeatedly-without-getting-a-time
         # https://github.com/pyusb/pyusb/blob/master/usb/core.py#line=997
         #
-        count = -1
-        pkt = array('B', [0]) * size
+        # Ownership: a read that is exactly one message is built in the
+        # pooled buffer, the message keeps it until release(msg). Other
+        # reads are decoded to messages with their own data and the
+        # buffer goes back right away.
+        #
+        if self._reader:
+            return self._take(t_out_ms)
+
+        # short reads until the deadline, the reply time is its arrival
+        deadline = _deadline(READ_TIMEOUT if t_out_ms is None else t_out_ms)
+        while not self._pending:
+            count = -1
+            pkt = self.pool.acquire(size)
+            try:
+                count = self._dev.read(
+                        self._inbound.bEndpointAddress, pkt,
+                        min(POLL_TIMEOUT, _remaining(deadline)))
+            except _usb().core.USBTimeoutError:
+                if time.monotonic() < deadline:
+                    self.pool.release(pkt)
+                    continue
+                _logger.info("_read timeout")
+            if self._verbose and count > 0:
+                read = bytes(pkt[:count]).hex(' ')
+                print("_read ({}): {}".format(count, read))
+
+            msgs = []
+            if count > 0:
+                msgs = self._decoder.feed(memoryview(pkt)[:count],
+                                          borrow=True)
+            if not any(isinstance(msg.data, memoryview)
+                       and msg.data.obj is pkt for msg in msgs):
+                self.pool.release(pkt)
+            self._pending.extend(msgs)
+            if count <= 0:
+                break
+
+        return self._pending.popleft() if self._pending else None
+
+    def _take(self, t_out_ms=None) -> message.Message:
+        """Next message of the background reader"""
+
+        if t_out_ms is None:
+            t_out_ms = READ_TIMEOUT
         try:
-            count = self._dev.read(
-                    self._inbound.bEndpointAddress, pkt, t_out_ms)
-        except usb.core.USBTimeoutError:
+            msg = self._messages.get(timeout=t_out_ms / 1000)
+        except queue.Empty:
             _logger.info("_read timeout")
+            return None
+
+        if isinstance(msg, Exception):
+            self._messages.put(msg)     # for the next reads too
+            raise msg
+
         if self._verbose:
-            read = bytes(pkt[:pkt[1]+5]).hex(' ')
-            print("_read ({}): {}".format(count, read))
+            print("_read (queue): {}".format(msg))
+
+        return msg
+
+    def _read_loop(self) -> None:
+        """Background reader, see start_reader"""
+
+        decoder = message.StreamDecoder()
+        pkt = array('B', bytes(READ_SIZE))
+        endpoint = self._inbound.bEndpointAddress
+        while not self._stop.is_set():
+            try:
+                count = self._dev.read(endpoint, pkt, POLL_TIMEOUT)
+            except _usb().core.USBTimeoutError:
+                continue
+            except _usb().core.USBError as err:
+                self.error = str(err)
+                _logger.error("reader stopped: %s", err)
+                self._messages.put(err)     # raised by _take
+                break
 
-        return message.build(pkt)
+            for msg in decoder.feed(memoryview(pkt)[:count]):
+                self._messages.put(msg)
 
     def _write(self, msg: message.Message) -> None:
 
@@ -343,6 +738,67 @@ To current time"""
             print(" - writtend ({}): {}".format(written, msg))
 
 
+def _find(select: ScopeId = None):
+    """The first DSO matching select
+A scope with a serial number is found by it alone, wherever it is
+plugged in again, the others by bus and address."""
+
+    match = {}
+    if select and select.serial:
+        match['custom_match'] = lambda dev: _serial(dev) == select.serial
+    elif select:
+        if select.bus is not None:
+            match['bus'] = select.bus
+        if select.address is not None:
+            match['address'] = select.address
+
+    return _usb().core.find(idVendor=VENDOR, idProduct=PRODUCT, **match)
+
+
+def _serial(dev) -> str:
+
+    try:
+        if dev.iSerialNumber:
+            return _usb().util.get_string(dev, dev.iSerialNumber)
+    except (_usb().core.USBError, ValueError, NotImplementedError):
+        pass    # no permission to read it
+
+    return None
+
+
+def _usb():
+    """pyusb, it is loaded with the first real device
+An except clause calls it only when an exception is raised, a read that
+succeeds does not import it."""
+
+    import usb.core
+    import usb.util
+
+    return usb
+
+
+def _progress(size: int) -> None:
+
+    print("\r{} bytes".format(size), end='', flush=True)
+
+
+def _deadline(t_out_ms: int = None) -> float:
+
+    if t_out_ms is None:
+        return None
+
+    return time.monotonic() + t_out_ms / 1000
+
+
+def _remaining(deadline: float = None) -> int:
+    """Timeout (ms) until deadline, pyusb takes 0 as no timeout"""
+
+    if deadline is None:
+        return None
+
+    return max(1, int((deadline - time.monotonic()) * 1000))
+
+
 def _read_sample_data_length(msg: message.Message) -> str:
 
     if not msg:
@@ -410,6 +866,16 @@ if __name__ == '__main__':
         if ARGS.set_time:
             DEV.set_system_time()
 
+        if ARGS.file:
+            with open(ARGS.file[1], 'wb') as OUT:
+                DEV.download_file(ARGS.file[0], OUT, _progress)
+            print()
+
+        if ARGS.screenshot:
+            with open(ARGS.screenshot, 'wb') as OUT:
+                DEV.download_screenshot(OUT, _progress)
+            print()
+
         if ARGS.unlock:
             DEV.lock_panel(False)
 
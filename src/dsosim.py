@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+"""Software DSO speaking the Das Oszi protocol
+https://elinux.org/Das_Oszi_Protocol
+
+SimDevice stands in for the pyusb device of dso.Dso:
+
+    sim = dsosim.SimDevice(latency=.05)
+    dev = scope.Scope(device=sim)
+    dev.dual()
+
+It answers 0x00 echo, 0x01 settings, 0x02 sample data (0x82 LEN / DATA /
+SUM messages), 0x10 read file, 0x12 lock, 0x13 keypress, 0x14 system time,
+0x20 screenshot and 0x44 buzzer.
+"""
+
+import argparse
+import random
+import threading
+import time
+from array import array
+from collections import deque
+
+import message
+import settings
+import synth
+
+PARSER = argparse.ArgumentParser('dsosim')
+PARSER.add_argument('-n', '--cycles', type=int, default=10,
+                    help='Dual channel reads')
+PARSER.add_argument('-l', '--latency', type=float, default=0,
+                    help='Acquisition latency (seconds)')
+PARSER.add_argument('-d', '--drop', type=float, default=0,
+                    help='Dropped packet rate (0 - 1)')
+PARSER.add_argument('-w', '--wrong', type=float, default=0,
+                    help='Wrong channel reply rate (0 - 1)')
+
+
+SETTINGS_LEN = 213
+SAMPLE_LEN = 4000
+SCREEN_LEN = 800 * 480 * 2    # bytes, RGB565
+CHUNK_LEN = 1000        # samples per 0x82 data message
+READ_TIMEOUT = 1000     # ms, pyusb default
+
+
+def default_settings() -> array:
+    """Settings block: CH1 2 V/DIV, CH2 5 V/DIV, 400 us/DIV, probe x1"""
+
+    data = array('B', bytes(SETTINGS_LEN))
+    data[settings.Settings.CH1_VOLTDIV.value] = settings.VoltDIVx1.V2.value
+    data[settings.Settings.CH2_VOLTDIV.value] = settings.VoltDIVx1.V5.value
+    data[settings.Settings.SECDEV.value] = settings.SecDIV.US400.value
+
+    return data
+
+
+def default_waveforms() -> dict:
+    """CH1 sine and CH2 square in phase"""
+
+    return {
+        0: synth.capture('sine', SAMPLE_LEN, noise=5),
+        1: synth.capture('square', SAMPLE_LEN, noise=5, seed=1),
+    }
+
+
+class _Endpoint:
+
+    def __init__(self, address: int) -> None:
+
+        self.bEndpointAddress = address
+
+
+class _Config:
+
+    def __getitem__(self, _key):
+
+        return [_Endpoint(0x02), _Endpoint(0x81)]
+
+
+class SimDevice:
+    """Simulated DSO with the pyusb device methods used by dso.Dso
+
+waveforms   {channel: capture} where a capture is bytes like or a
+            function returning one for every request
+latency     seconds from a sample request to its first reply
+drop        rate of reply packets that never arrive
+wrong       rate of sample replies from the other channel
+stopped     reply sample requests with the STOP subcommand
+files       {path: bytes} for 0x10 read file
+screenshot  bytes of the 0x20 screenshot
+merge       a read returns all the ready replies together
+read_size   most bytes a read returns, the rest of a reply comes next
+"""
+
+    def __init__(self, waveforms: dict = None, settings_data: array = None,
+                 latency: float = 0, drop: float = 0, wrong: float = 0,
+                 chunk_len: int = CHUNK_LEN, seed: int = 0,
+                 merge: bool = False, read_size: int = None) -> None:
+
+        self.waveforms = waveforms or default_waveforms()
+        self.settings = settings_data or default_settings()
+        self.latency = latency
+        self.drop = drop
+        self.wrong = wrong
+        self.chunk_len = chunk_len
+        self.merge = merge
+        self.read_size = read_size
+        self.stopped = False
+        self.locked = False
+        self.keys = []          # pressed keys
+        self.files = {}
+        self.screenshot = bytes(range(256)) * (SCREEN_LEN // 256)
+        self.stats = {'write': 0, 'read': 0, 'dropped': 0, 'timeout': 0}
+
+        self._rnd = random.Random(seed)
+        self._replies = deque()     # (ready time, packet)
+        self._out = bytearray()     # bytes of the replies being read
+        self._cond = threading.Condition()
+
+    # pyusb device
+
+    def get_active_configuration(self) -> _Config:
+        """Configuration with the 0x02 OUT and 0x81 IN endpoints"""
+
+        return _Config()
+
+    def set_configuration(self) -> None:
+        """Nothing to configure"""
+
+    def is_kernel_driver_active(self, _interface: int) -> bool:
+        """No kernel driver"""
+
+        return False
+
+    def detach_kernel_driver(self, _interface: int) -> None:
+        """No kernel driver"""
+
+    def write(self, _endpoint: int, data, _timeout: int = None) -> int:
+        """Receive a request packet"""
+
+        self.stats['write'] += 1
+        pkt = array('B', data)
+        msg = message.build(pkt)
+        if msg and msg.checksum:
+            self._handle(msg)
+
+        return len(pkt)
+
+    def read(self, _endpoint: int, buffer, timeout: int = None) -> int:
+        """Send the next reply packet into buffer"""
+
+        if timeout is None:
+            timeout = READ_TIMEOUT
+        deadline = time.monotonic() + timeout / 1000
+
+        with self._cond:
+            while not self._out:
+                now = time.monotonic()
+                while self._replies and self._replies[0][0] <= now:
+                    self._out += self._replies.popleft()[1]
+                    if not self.merge:
+                        break
+                if self._out:
+                    break
+
+                wait = deadline - now
+                if self._replies:
+                    wait = min(wait, self._replies[0][0] - now)
+                if deadline <= now:
+                    self.stats['timeout'] += 1
+                    raise _timeout_error()
+                self._cond.wait(wait)
+
+            self.stats['read'] += 1
+            size = min(len(self._out), len(buffer),
+                       self.read_size or len(buffer))
+            memoryview(buffer)[:size] = self._out[:size]
+            del self._out[:size]
+
+        return size
+
+    # protocol
+
+    def _handle(self, msg: message.Message) -> None:
+
+        data = msg.data if msg.data is not None else array('B')
+        if msg.mark == message.DEBUG_MESSAGE_MARKER:
+            if msg.command == 0x44:     # buzzer
+                self._reply(0x44, mark=message.DEBUG_MESSAGE_MARKER)
+            return
+
+        if msg.command == 0x00:         # echo
+            self._reply(0x00, data=data)
+
+        elif msg.command == 0x01:       # settings
+            self._reply(0x01, data=self.settings)
+
+        elif msg.command == 0x02 and msg.subcommand == 0x01:
+            self._sample(data[0] if data else 0)
+
+        elif msg.command == 0x10:       # read file
+            path = bytes(data).decode('ascii', 'replace')
+            self._download(0x10, self.files.get(path))
+
+        elif msg.command == 0x20:       # screenshot
+            self._download(0x20, self.screenshot)
+
+        elif msg.command == 0x12:       # lock / acquisition
+            if msg.subcommand == 0x01:
+                self.locked = bool(data and data[0])
+            elif msg.subcommand == 0x00:
+                self.stopped = bool(data and data[0])
+            self._reply(0x12, subcommand=msg.subcommand)
+
+        elif msg.command == 0x13:       # keypress
+            if data:
+                self.keys.append(data[0])
+            self._reply(0x13)
+
+        elif msg.command == 0x14:       # system time
+            self._reply(0x14)
+
+    def _sample(self, chan: int) -> None:
+        """0x82 replies of a sample request"""
+
+        delay = self.latency
+        cmd = message.SAMPLE_RESPONSE_CMD & 0x7F
+        if self.stopped:
+            self._reply(cmd, message.SAMPLE_STOP_SUBCMD, [chan], delay)
+            return
+
+        if self.wrong and self._rnd.random() < self.wrong:
+            chan = 1 - chan
+
+        wave = self.waveforms.get(chan, b'')
+        if callable(wave):
+            wave = wave()
+        wave = bytes(wave)
+        length = len(wave)
+
+        self._reply(cmd, message.SAMPLE_LEN_SUBCMD,
+                    [chan, length & 0xFF, (length >> 8) & 0xFF,
+                     (length >> 16) & 0xFF], delay)
+        for idx in range(0, length, self.chunk_len):
+            chunk = array('B', [chan])
+            chunk.frombytes(wave[idx:idx+self.chunk_len])
+            self._reply(cmd, message.SAMPLE_DATA_SUBCMD, chunk, delay)
+        self._reply(cmd, message.SAMPLE_SUM_SUBCMD,
+                    [chan, sum(wave) & 0xFF], delay)
+
+    def _download(self, command: int, content: bytes) -> None:
+        """0x00 status, 0x01 data chunks and 0x02 check sum replies"""
+
+        if content is None:     # not found
+            self._reply(command, 0x00, [0x01])
+            self._reply(command, 0x02, [])
+            return
+
+        self._reply(command, 0x00, [0x00])
+        view = memoryview(bytes(content))
+        for idx in range(0, len(view), self.chunk_len):
+            self._reply(command, 0x01, view[idx:idx+self.chunk_len])
+        self._reply(command, 0x02, [sum(view) & 0xFF])
+
+    def _reply(self, command: int, subcommand: int = -1, data=None,
+               delay: float = 0, mark: int = message.NORMAL_MESSAGE_MARKER):
+
+        if self.drop and self._rnd.random() < self.drop:
+            self.stats['dropped'] += 1
+            return
+
+        msg = message.Message(mark=mark, command=command | 0x80,
+                              subcommand=subcommand)
+        if data is not None:
+            msg.data = array('B', data)
+        pkt = message.create_packet(msg).tobytes()
+
+        with self._cond:
+            self._replies.append((time.monotonic() + delay, pkt))
+            self._cond.notify_all()
+
+
+def _timeout_error() -> Exception:
+    """USB read timeout as pyusb raises it"""
+
+    try:
+        from usb.core import USBTimeoutError
+    except ImportError:
+        return TimeoutError('Operation timed out')
+
+    return USBTimeoutError('Operation timed out')
+
+
+if __name__ == '__main__':
+
+    import scope
+
+    ARGS = PARSER.parse_args()
+    SIM = SimDevice(latency=ARGS.latency, drop=ARGS.drop, wrong=ARGS.wrong)
+    DEV = scope.Scope(device=SIM)
+
+    START = time.perf_counter()
+    for _ in range(ARGS.cycles):
+        try:
+            WAVES = DEV.dual()
+        except Exception as err:    # keep cycling like the controller
+            print(type(err).__name__, err)
+            continue
+        print(' '.join('{}:{}'.format(wave.typ.name, wave.vpp)
+                       for wave in WAVES))
+    ELAPSED = time.perf_counter() - START
+    DEV.close()
+
+    print('{} cycles in {:.2f} s ({:.3f} s/cycle) {}'.format(
+        ARGS.cycles, ELAPSED, ELAPSED / ARGS.cycles, SIM.stats))
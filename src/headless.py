@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+"""Continuous test without the window
+The Controller of main.pyw runs on a plain timer loop instead of Tk,
+the verdicts go to stdout and the log. Nothing of tkinter or pynput is
+loaded, pyusb only with the device.
+
+    python headless.py              # continuous, until Ctrl+C
+    python headless.py -s           # one single read, exit 0 when OK
+    python -X importtime headless.py --sim -s 2> importtime.log
+"""
+
+import argparse
+import signal
+import sys
+import time
+from datetime import datetime
+
+START = time.perf_counter()     # before the imports of the application
+
+import controller
+import log
+import runner
+from ng_state import NgState
+
+IMPORTED = time.perf_counter()
+
+PARSER = argparse.ArgumentParser('headless')
+PARSER.add_argument('-s', '--single', help='One single read, then exit',
+                    action='store_true')
+PARSER.add_argument('-t', '--time', type=float, default=0,
+                    help='Run for seconds (default: until Ctrl+C)')
+PARSER.add_argument('-v', '--verbose', help='Show the device messages',
+                    action='store_true')
+PARSER.add_argument('--sim', help='DSO simulator instead of the USB one',
+                    action='store_true')
+
+
+class Loop(runner.Timers):
+    """Tk after() and mainloop() without a window"""
+
+    def __init__(self) -> None:
+
+        super().__init__(_clock())
+        self.running = False
+
+    def after(self, delay: int, func) -> None:
+        """Call func delay milliseconds from now"""
+
+        self.now = _clock()
+        super().after(delay, func)
+
+    def run(self, duration: float = None) -> None:
+        """Run the timers until stop(), duration seconds or none is left"""
+
+        end = None if duration is None else _clock() + duration * 1000
+        self.running = True
+        while self.running and self:
+            if end is not None and self.due > end:
+                break
+
+            wait = self.due - _clock()
+            if wait > 0:
+                time.sleep(wait / 1000)
+                continue
+
+            self.pop()()
+
+    def stop(self) -> None:
+        """Leave run()"""
+
+        self.running = False
+
+
+class Headless:
+    """Controller with console output"""
+
+    first_verdict: float = None     # s, from START to the first OK / NG
+    verdict: NgState = None         # OK / NG of the last read
+    state: NgState = None
+
+    def __init__(self, device=None, verbose: bool = False) -> None:
+
+        self.verbose = verbose
+        self.loop = Loop()
+        self._message = ''
+        self.ctrl = controller.Controller(
+            device=device, job_runner=runner.InlineRunner())
+        self.ctrl.set_callbacks({
+            'ng': self._ng,
+            'reading': lambda text: None,
+            'device': self._device,
+            'channels': lambda states: None,
+            'disable_buttons': lambda disable: None,
+        })
+
+    def run(self, single: bool = False, duration: float = None) -> None:
+        """Continuous test, or a single read"""
+
+        if single:
+            self.ctrl.single()
+        else:
+            self.ctrl.toggle()
+        self.loop.run(duration)
+
+    def _ng(self, state: NgState) -> Loop:
+
+        if state in (NgState.OK, NgState.NG):
+            self.verdict = state
+            if self.first_verdict is None:
+                self.first_verdict = time.perf_counter() - START
+                _logger.info("first verdict %s after %.3f s", state.name,
+                             self.first_verdict)
+
+        if state != self.state:
+            self.state = state
+            _print(state.name)
+
+        return self.loop
+
+    def _device(self, text) -> None:
+
+        text = str(text)
+        if text and text != self._message:
+            _logger.info(text)
+            if self.verbose:
+                _print(text)
+        self._message = text
+
+
+def _clock() -> float:
+    """time.monotonic() in milliseconds"""
+
+    return time.monotonic() * 1000
+
+
+def _print(text: str) -> None:
+
+    print('{} {}'.format(datetime.now().strftime('%H:%M:%S'), text),
+          flush=True)
+
+
+def _sim_device():
+
+    import dsosim
+
+    return dsosim.SimDevice()
+
+
+_logger = log.setup_log('headless')
+
+
+if __name__ == '__main__':
+
+    ARGS = PARSER.parse_args()
+
+    APP = Headless(_sim_device() if ARGS.sim else None, ARGS.verbose)
+    signal.signal(signal.SIGTERM, lambda *_: APP.loop.stop())
+    try:
+        APP.run(ARGS.single, ARGS.time or None)
+    except KeyboardInterrupt:
+        pass
+    if APP.ctrl.polling:
+        APP.ctrl.toggle()
+
+    print('imports {:.3f} s, first verdict {}'.format(
+        IMPORTED - START,
+        'after {:.3f} s'.format(APP.first_verdict)
+        if APP.first_verdict is not None else '-'))
+    if ARGS.single:
+        sys.exit(0 if APP.verdict == NgState.OK else 1)
@@ -4,8 +4,7 @@
 from os import path
 
 import tkinter as tk
-from tkinter import ttk  # submodules
-from pynput import keyboard
+from tkinter import messagebox, ttk  # submodules
 
 import controller
 from ng_state import NgState
@@ -102,19 +101,36 @@ def _ng_ok():
     ng_status.config(text="OK", background=BG_OK)
 
 
+def show_error(title: str, err: Exception) -> None:
+    """Error dialog"""
+
+    try:
+        messagebox.showerror(title, err)
+    except tk.TclError as tkerr:
+        print('show_error {}'.format(tkerr))
+
+
 def on_press(key):
     """Listen keyboard pressed"""
 
+    from pynput import keyboard     # loaded by listen
+
     if key == keyboard.Key.media_volume_up:
         ctrl.single()
     else:
         print('on_press {}'.format(key))
 
 
-listener = keyboard.Listener(
-        on_press=on_press,
-        on_release=None)
-listener.start()
+def listen() -> None:
+    """Start the global keyboard listener, pynput is slow to load so it
+waits until the window is up"""
+
+    from pynput import keyboard
+
+    listener = keyboard.Listener(
+            on_press=on_press,
+            on_release=None)
+    listener.start()
 
 
 ctrl = controller.Controller()
@@ -124,6 +140,8 @@ ctrl.set_callbacks({
     "device": set_device_status,
     "channels": set_channel_states,
     "disable_buttons": disable_buttons,
+    "error": show_error,
+    "after": lambda ms, func: root.after(ms, func),
 })
 
 root = tk.Tk()
@@ -170,4 +188,5 @@ device_status = ttk.Label(root, text="Version {}".format(VERSION))
 device_status.grid(row=4, column=0, padx=10, pady=5,
                    sticky=tk.N+tk.S+tk.W+tk.E)
 
+root.after_idle(listen)
 root.mainloop()
@@ -1,11 +1,14 @@
 """DSO Protocol Message"""
 
 from array import array
-from dataclasses import dataclass
 
 DEBUG_MESSAGE_MARKER = 0x43
 NORMAL_MESSAGE_MARKER = 0x53
 
+MIN_LENGTH = 2          # length field of a message: command and check sum
+MAX_LENGTH = 0x1000     # longest reply, a data chunk of a read buffer
+RESPONSE_FLAG = 0x80    # in the command of every DSO reply
+
 SETTINGS_RESPONSE_CMD = 0x81
 
 SAMPLE_RESPONSE_CMD = 0x82
@@ -25,21 +28,55 @@ NORMAL_SUBCOMMAND = [
 ]   # The command with subcommand
 
 
-@dataclass
 class Message:
-    """Protocol Message"""
+    """Protocol Message
+data is an array to send, or a memoryview into the received packet"""
+
+    __slots__ = ('mark', 'length', 'command', 'subcommand', 'data',
+                 'checksum', 'response')
+
+    def __init__(self, mark: int = NORMAL_MESSAGE_MARKER, length: int = 0,
+                 command: int = 0, subcommand: int = -1, data: array = None,
+                 checksum: bool = False, response: bool = False) -> None:
+
+        self.mark = mark
+        self.length = length
+        self.command = command
+        self.subcommand = subcommand
+        self.data = data
+        self.checksum = checksum
+        self.response = response    # response from DSO
+
+    def _fields(self) -> tuple:
+
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other) -> bool:
+
+        if not isinstance(other, Message):
+            return NotImplemented
+
+        return self._fields() == other._fields()
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
 
-    mark: int = NORMAL_MESSAGE_MARKER
-    length: int = 0
-    command: int = 0
-    subcommand: int = -1
-    data: array = None
-    checksum: bool = False
-    response: bool = False  # response from DSO
+        data = self.data
+        if isinstance(data, memoryview):
+            data = data.tolist()
+
+        return 'Message(mark={}, length={}, command={}, subcommand={}, ' \
+            'data={}, checksum={}, response={})'.format(
+                self.mark, self.length, self.command, self.subcommand,
+                data, self.checksum, self.response)
 
 
 def build(pkt: array) -> Message:
-    """Build a message from array"""
+    """Build a message from array
+pkt ends with the bytes received, not with a stale tail of a reused
+buffer. The data is a memoryview into pkt, it is valid as long as pkt
+is not reused for another packet. Copy it to keep it longer."""
 
     if pkt[0] == 0:
         return None
@@ -62,7 +99,7 @@ def build(pkt: array) -> Message:
         msg.subcommand = pkt[data_idx]
         data_idx += 1
 
-    msg.data = pkt[data_idx: msg.length+2]
+    msg.data = memoryview(pkt)[data_idx: msg.length+2]
 
     return msg
 
@@ -89,13 +126,120 @@ def create_packet(msg: Message) -> array:
 
 
 def make_sum(pkt: array) -> int:
-    """Create check sum"""
+    """Create check sum of array('B'), bytes or memoryview"""
+
+    return sum(pkt) & 0xFF
+
+
+class Checksum:
+    """Check sum of data that arrives in chunks"""
+
+    __slots__ = ('_sum',)
+
+    def __init__(self, data: array = None) -> None:
+
+        self._sum = 0
+        if data:
+            self.update(data)
+
+    def update(self, data: array) -> None:
+        """Add a chunk"""
+
+        self._sum = (self._sum + sum(data)) & 0xFF
+
+    def digest(self) -> int:
+        """Check sum of all chunks"""
+
+        return self._sum
+
+
+class StreamDecoder:
+    """Split a byte stream into checksum verified messages
+A chunk may hold several messages or a part of one, the bytes of an
+incomplete message are kept for the next chunk. Bytes that do not start
+a valid message are skipped up to the next marker. A marker byte among
+the samples is taken for a message only with a length in MIN_LENGTH -
+MAX_LENGTH and a reply command, so it cannot hold back the stream."""
+
+    __slots__ = ('_buf', 'skipped')
+
+    def __init__(self) -> None:
+
+        self._buf = bytearray()
+        self.skipped = 0    # bytes thrown away to resync
+
+    def __len__(self) -> int:
+        """Bytes waiting for the rest of their message"""
+
+        return len(self._buf)
+
+    def feed(self, chunk, borrow: bool = False) -> list:
+        """Messages completed by chunk
+borrow: a chunk that is exactly one message is built in place, its data
+points into chunk like build(). Otherwise the messages own their data."""
+
+        if borrow and not self._buf and _is_packet(chunk):
+            msg = build(chunk)
+            if msg.checksum:
+                return [msg]
+
+        buf = self._buf
+        buf += chunk
+        out = []
+        while buf:
+            start = _find_marker(buf)
+            if start != 0:
+                if start < 0:
+                    start = len(buf)
+                del buf[:start]
+                self.skipped += start
+                continue
+
+            if len(buf) < 4:
+                break
+            length = buf[1] + (buf[2] << 8)
+            if not MIN_LENGTH <= length <= MAX_LENGTH \
+                    or not buf[3] & RESPONSE_FLAG:
+                del buf[0]  # not a message marker
+                self.skipped += 1
+                continue
+            end = length + 3
+            if len(buf) < end:
+                break
+
+            pkt = array('B')
+            pkt.frombytes(buf[:end])
+            msg = build(pkt)
+            if not msg.checksum:
+                del buf[0]
+                self.skipped += 1
+                continue
+
+            del buf[:end]
+            out.append(msg)
+
+        return out
+
+    def reset(self) -> None:
+        """Drop the waiting bytes"""
+
+        self._buf.clear()
+
+
+def _find_marker(buf: bytearray) -> int:
+
+    found = [idx for idx in (buf.find(NORMAL_MESSAGE_MARKER),
+                             buf.find(DEBUG_MESSAGE_MARKER)) if idx >= 0]
+
+    return min(found) if found else -1
+
 
-    summary = 0
-    for dat in pkt:
-        summary += dat
+def _is_packet(chunk) -> bool:
+    """chunk is exactly one message by its marker and length"""
 
-    return summary & 0xFF
+    return len(chunk) >= 3 \
+        and chunk[0] in (NORMAL_MESSAGE_MARKER, DEBUG_MESSAGE_MARKER) \
+        and len(chunk) == chunk[1] + (chunk[2] << 8) + 3
 
 
 def _checksum(pkt: array) -> bool:
@@ -105,4 +249,4 @@ def _checksum(pkt: array) -> bool:
     if chk_idx >= len(pkt):
         return False
 
-    return make_sum(pkt[:chk_idx]) == pkt[chk_idx]
+    return make_sum(memoryview(pkt)[:chk_idx]) == pkt[chk_idx]
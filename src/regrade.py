@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+"""Re-grade archived captures
+A capture is a group of files with the same name:
+    <name>.ch1      raw unsigned samples of CH1
+    <name>.ch2      raw unsigned samples of CH2
+    <name>.set      213 bytes DSO settings block (optional, for Vp-p)
+    <name>.verdict  stored verdict name, e.g. OK (optional)
+in a directory or in a .zip / .tar(.gz) archive, or the records of a
+capture.Recorder segment (.seg).
+"""
+
+import argparse
+import os
+import tarfile
+import zipfile
+from array import array
+from collections import Counter
+from concurrent import futures
+
+import capture
+import log
+import settings
+import waveform
+from verdict import Verdict, judge
+
+PARSER = argparse.ArgumentParser('regrade')
+PARSER.add_argument('source', help='Capture directory or archive')
+PARSER.add_argument('-j', '--jobs', type=int,
+                    help='Worker processes (default: CPU count)')
+PARSER.add_argument('-p', '--percent', type=int,
+                    help='Override waveform.PERCENT_TO_PEAK')
+PARSER.add_argument('-a', '--avg-len', type=int,
+                    help='Override waveform.AVERAGE_LENGTH')
+PARSER.add_argument('-q', '--quiet', help='Summary only',
+                    action='store_true')
+
+
+CH1, CH2, SETTINGS, VERDICT = '.ch1', '.ch2', '.set', '.verdict'
+EXTENSIONS = (CH1, CH2, SETTINGS, VERDICT)
+JOBS_PER_WORKER = 4     # captures in flight per worker process
+
+
+def grade(ch1: bytes, ch2: bytes, raw_settings: bytes = None) -> Verdict:
+    """Verdict of a capture as the controller judges it"""
+
+    return judge(waves(ch1, ch2, raw_settings))
+
+
+def waves(ch1: bytes, ch2: bytes, raw_settings: bytes = None) -> list:
+    """Wave forms of a capture as scope.Scope.dual returns them"""
+
+    sett = None
+    if raw_settings and len(raw_settings) == 213:
+        sett = settings.create(array('B', raw_settings))
+
+    out = []
+    for channel, data in enumerate((ch1, ch2), 1):
+        wave = waveform.get_wave_form(data, waveform.AVERAGE_LENGTH)
+        wave.vpp = settings.vpp(sett, channel, wave.p2p)
+        out.append(wave)
+
+    return out
+
+
+def read_captures(source: str):
+    """Yield (name, {extension: bytes}) of every capture in source"""
+
+    if os.path.isdir(source):
+        return _dir_captures(source)
+    if source.endswith(capture.SEGMENT_EXT):
+        return _segment_captures(source)
+    if zipfile.is_zipfile(source):
+        return _zip_captures(source)
+    if tarfile.is_tarfile(source):
+        return _tar_captures(source)
+
+    raise ValueError('Unknown capture source {}'.format(source))
+
+
+def regrade(source: str, jobs: int = None,
+            percent: int = None, avg_len: int = None):
+    """Yield (name, verdict, stored verdict name) as the captures finish"""
+
+    jobs = jobs or os.cpu_count() or 1
+    with futures.ProcessPoolExecutor(
+            jobs, initializer=_init_worker,
+            initargs=(percent, avg_len)) as pool:
+
+        pending = {}
+        for name, files in read_captures(source):
+            if CH1 not in files or CH2 not in files:
+                _logger.warning('%s: incomplete capture', name)
+                continue
+
+            if len(pending) >= jobs * JOBS_PER_WORKER:
+                done, _ = futures.wait(
+                        pending, return_when=futures.FIRST_COMPLETED)
+                for fut in done:
+                    yield _result(pending.pop(fut), fut)
+
+            fut = pool.submit(
+                    grade, files[CH1], files[CH2], files.get(SETTINGS))
+            pending[fut] = (name, files.get(VERDICT))
+
+        for fut in futures.as_completed(pending):
+            yield _result(pending[fut], fut)
+
+
+def _init_worker(percent: int, avg_len: int) -> None:
+    """Apply the criteria overrides in a worker process"""
+
+    if percent is not None:
+        waveform.PERCENT_TO_PEAK = percent
+    if avg_len is not None:
+        waveform.AVERAGE_LENGTH = avg_len
+
+
+def _result(job: tuple, fut: futures.Future) -> tuple:
+
+    name, stored = job
+    if stored is not None:
+        stored = stored.decode('ascii').strip()
+
+    return name, fut.result(), stored
+
+
+def _group(names) -> dict:
+    """{capture name: {extension: file name}}"""
+
+    out = {}
+    for filename in names:
+        name, ext = os.path.splitext(filename)
+        if ext in EXTENSIONS:
+            out.setdefault(name, {})[ext] = filename
+
+    return out
+
+
+def _dir_captures(source: str):
+
+    names = []
+    for folder, _, filenames in os.walk(source):
+        for filename in filenames:
+            names.append(os.path.relpath(
+                os.path.join(folder, filename), source))
+
+    groups = _group(names)
+    for name in sorted(groups):
+        files = {}
+        for ext, filename in groups[name].items():
+            with open(os.path.join(source, filename), 'rb') as infile:
+                files[ext] = infile.read()
+        yield name, files
+
+
+def _segment_captures(source: str):
+
+    name = os.path.splitext(os.path.basename(source))[0]
+    with capture.Segment(source) as segment:
+        for idx, record in enumerate(segment):
+            if record.kind != capture.CAPTURE:
+                continue
+            files = {CH1: bytes(record.ch1), CH2: bytes(record.ch2)}
+            block = segment.settings(record.fingerprint)
+            if block is not None:
+                with block:     # a view into the segment
+                    files[SETTINGS] = bytes(block)
+            if record.verdict:
+                files[VERDICT] = record.verdict.name.encode('ascii')
+            yield '{}#{}'.format(name, idx), files
+
+
+def _zip_captures(source: str):
+
+    with zipfile.ZipFile(source) as archive:
+        groups = _group(archive.namelist())
+        for name in sorted(groups):
+            yield name, {ext: archive.read(filename)
+                         for ext, filename in groups[name].items()}
+
+
+def _tar_captures(source: str):
+
+    with tarfile.open(source) as archive:
+        members = {member.name: member
+                   for member in archive.getmembers() if member.isfile()}
+        groups = _group(members)
+        for name in sorted(groups):
+            yield name, {ext: archive.extractfile(members[filename]).read()
+                         for ext, filename in groups[name].items()}
+
+
+_logger = log.setup_log('regrade')
+
+
+if __name__ == '__main__':
+
+    ARGS = PARSER.parse_args()
+
+    COUNT = Counter()
+    FLIPS = Counter()
+    for NAME, RESULT, STORED in regrade(ARGS.source, ARGS.jobs,
+                                        ARGS.percent, ARGS.avg_len):
+        COUNT[RESULT.name] += 1
+        FLIPPED = STORED is not None and STORED != RESULT.name
+        if FLIPPED:
+            FLIPS['{} -> {}'.format(STORED, RESULT.name)] += 1
+
+        if not ARGS.quiet:
+            if FLIPPED:
+                print('{}: {} (was {})'.format(NAME, RESULT.name, STORED),
+                      flush=True)
+            else:
+                print('{}: {}'.format(NAME, RESULT.name), flush=True)
+
+    print('Total: {}'.format(sum(COUNT.values())))
+    for KEY, VAL in COUNT.most_common():
+        print('  {}: {}'.format(KEY, VAL))
+    print('Flipped: {}'.format(sum(FLIPS.values())))
+    for KEY, VAL in FLIPS.most_common():
+        print('  {}: {}'.format(KEY, VAL))
@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+"""Replay recorded captures through the controller
+The real Controller decision path (OK / NG counters, single read retries,
+Vp-p check) runs on the captures of a regrade.py source. A virtual clock
+stands in for Tk after(), the polling delays take no time, so a replay
+runs at the speed of the analysis.
+
+    play = Replay('captures/capture-20240102-030405-000000.seg')
+    for cycle in play.run():
+        print(cycle.time, cycle.verdict, cycle.state)
+    print(play.cycles_per_second)
+"""
+
+import argparse
+import time
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+
+import controller
+import log
+import regrade
+import runner
+import waveform
+from ng_state import NgState
+from verdict import Verdict
+
+PARSER = argparse.ArgumentParser('replay')
+PARSER.add_argument('source', help='Capture directory, archive or segment')
+PARSER.add_argument('-s', '--single', help='Single reads, like the button',
+                    action='store_true')
+PARSER.add_argument('-p', '--percent', type=int,
+                    help='Override waveform.PERCENT_TO_PEAK')
+PARSER.add_argument('-a', '--avg-len', type=int,
+                    help='Override waveform.AVERAGE_LENGTH')
+PARSER.add_argument('-q', '--quiet', help='Summary only',
+                    action='store_true')
+
+
+@dataclass
+class Cycle:
+    """One read of the replay
+time is the virtual time in milliseconds, state and message what the
+controller showed after the read"""
+
+    name: str
+    time: int
+    verdict: Verdict = None
+    stored: str = None      # verdict name recorded with the capture
+    state: NgState = None
+    message: str = ''
+
+
+class VirtualClock(runner.Timers):
+    """Tk after() without waiting, timers run in order of their due time"""
+
+    def step(self) -> bool:
+        """Run the next timer, False when there is none"""
+
+        if not self:
+            return False
+
+        self.pop()()
+        return True
+
+
+class ReplayScope:
+    """scope.Scope stand-in, dual() returns the next capture"""
+
+    def __init__(self, captures) -> None:
+        """captures: (name, {extension: bytes}) like regrade.read_captures"""
+
+        self._captures = iter(captures)
+        self._next = None
+        self.current = None     # (name, files) of the last dual()
+        self._advance()
+
+    @property
+    def done(self) -> bool:
+        """All captures were read"""
+
+        return self._next is None
+
+    @property
+    def settings_block(self) -> tuple:
+        """(fingerprint, raw settings) of the current capture"""
+
+        return 0, self.current[1].get(regrade.SETTINGS)
+
+    def dual(self) -> list:
+        """Wave forms of the next capture"""
+
+        if self._next is None:
+            raise EOFError('No more captures')
+
+        self.current = self._next
+        self._advance()
+        files = self.current[1]
+        waves = regrade.waves(files[regrade.CH1], files[regrade.CH2],
+                              files.get(regrade.SETTINGS))
+        for wave, ext in zip(waves, (regrade.CH1, regrade.CH2)):
+            wave.raw = array('B', files[ext])
+
+        return waves
+
+    def revalidate(self) -> bool:
+        """Settings come with the captures"""
+
+        return False
+
+    def alarm(self, delay: int = 1) -> None:
+        """No buzzer"""
+
+    def close(self) -> None:
+        """Nothing to close"""
+
+    def _advance(self) -> None:
+
+        self._next = None
+        for name, files in self._captures:
+            if regrade.CH1 in files and regrade.CH2 in files:
+                self._next = (name, files)
+                break
+            _logger.warning('%s: incomplete capture', name)
+
+
+class Replay:
+    """Controller driven by a virtual clock on recorded captures
+It is the recorder of the controller too, to see every verdict."""
+
+    elapsed = 0.    # s, wall time of the last run
+
+    def __init__(self, source, single: bool = False) -> None:
+        """source: regrade.py capture source, or (name, files) pairs
+        single: single reads instead of continuous polling"""
+
+        if isinstance(source, str):
+            source = regrade.read_captures(source)
+        self.single = single
+        self.clock = VirtualClock()
+        self.scope = ReplayScope(source)
+        self.cycles = []
+        self._cycle = None  # of the running timer
+        self._ctrl = controller.Controller(
+            job_runner=runner.InlineRunner(), recorder=self,
+            reader=self.scope)
+        self._ctrl.set_callbacks({
+            'ng': self._ng,
+            'reading': lambda text: None,
+            'device': self._device,
+            'channels': lambda states: None,
+            'disable_buttons': lambda disable: None,
+        })
+        self._ctrl.beep = lambda result_ok=True: None   # silent replay
+
+    @property
+    def cycles_per_second(self) -> float:
+        """Reads per second of wall time"""
+
+        return len(self.cycles) / self.elapsed if self.elapsed else 0.
+
+    def run(self) -> list:
+        """Play all captures, returns the cycles"""
+
+        start = time.perf_counter()
+        while not self.scope.done:
+            if not self.clock.step():
+                # stopped, e.g. after a single read
+                self.clock.after(0, self._start)
+                continue
+            self._cycle = None
+        self.elapsed = time.perf_counter() - start
+
+        return self.cycles
+
+    def record(self, _ch1, _ch2, _fingerprint=None, _raw_settings=None,
+               verdict: Verdict = None, timestamp: float = None) -> None:
+        """capture.Recorder interface, the judged cycle"""
+
+        name, files = self.scope.current
+        stored = files.get(regrade.VERDICT)
+        if stored is not None:
+            stored = stored.decode('ascii').strip()
+        self._cycle = Cycle(name, self.clock.now, verdict, stored)
+        self.cycles.append(self._cycle)
+
+    def close(self) -> None:
+        """capture.Recorder interface, nothing to close"""
+
+    def _start(self) -> None:
+
+        if self.single:
+            self._ctrl.single()
+        else:
+            self._ctrl.toggle()
+
+    def _ng(self, state: NgState) -> VirtualClock:
+
+        if self._cycle:
+            self._cycle.state = state
+        return self.clock
+
+    def _device(self, text) -> None:
+
+        if self._cycle and text:
+            self._cycle.message = str(text)
+
+
+_logger = log.setup_log('replay')
+
+
+if __name__ == '__main__':
+
+    ARGS = PARSER.parse_args()
+    if ARGS.percent is not None:
+        waveform.PERCENT_TO_PEAK = ARGS.percent
+    if ARGS.avg_len is not None:
+        waveform.AVERAGE_LENGTH = ARGS.avg_len
+
+    PLAY = Replay(ARGS.source, ARGS.single)
+    COUNT = Counter()
+    FLIPS = 0
+    for CYCLE in PLAY.run():
+        COUNT[CYCLE.state.name if CYCLE.state else None] += 1
+        FLIPPED = CYCLE.stored is not None \
+            and CYCLE.stored != CYCLE.verdict.name
+        FLIPS += FLIPPED
+        if not ARGS.quiet:
+            print('{:8.1f} s {}: {} {} {}{}'.format(
+                CYCLE.time / 1000, CYCLE.name, CYCLE.verdict.name,
+                CYCLE.state.name if CYCLE.state else '-', CYCLE.message,
+                ' (was {})'.format(CYCLE.stored) if FLIPPED else ''))
+
+    print('{} cycles in {:.3f} s, {:.1f} cycles/s, {:.1f} s virtual'.format(
+        len(PLAY.cycles), PLAY.elapsed, PLAY.cycles_per_second,
+        PLAY.clock.now / 1000))
+    for KEY, VAL in COUNT.most_common():
+        print('  {}: {}'.format(KEY, VAL))
+    print('Flipped: {}'.format(FLIPS))
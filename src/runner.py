@@ -0,0 +1,154 @@
+"""Run the scope jobs of the controller
+ThreadRunner keeps USB waits and analysis off the Tk mainloop,
+InlineRunner runs them in place, e.g. for replays and tests.
+Timers is the after() of a mainloop without Tk.
+
+A job is a function without arguments, done(result, error) is called
+with its return value or the exception it raised. The error of a job
+without done is logged.
+"""
+
+import heapq
+import queue
+import threading
+
+import log
+
+POLL_TIME = 20      # in milliseconds, results check of the mainloop
+
+
+class Timers:
+    """Tk after() timers in order of their due time
+The owner runs the function pop() returns, now follows the due time of
+the popped timer, e.g. a virtual clock, or is set to the real time."""
+
+    def __init__(self, now: float = 0) -> None:
+
+        self.now = now      # ms
+        self._heap = []
+        self._count = 0     # keeps the order of timers due at the same time
+
+    def __len__(self) -> int:
+
+        return len(self._heap)
+
+    @property
+    def due(self) -> float:
+        """Due time of the next timer, None when there is none"""
+
+        return self._heap[0][0] if self._heap else None
+
+    def after(self, delay: int, func) -> None:
+        """Call func delay milliseconds later"""
+
+        self._count += 1
+        heapq.heappush(self._heap, (self.now + delay, self._count, func))
+
+    def pop(self):
+        """Function of the next timer, now moves to its due time"""
+
+        self.now, _, func = heapq.heappop(self._heap)
+
+        return func
+
+
+class InlineRunner:
+    """Run a job right away in the calling thread"""
+
+    def submit(self, job, done=None) -> None:
+        """Run job and call done"""
+
+        result, error = None, None
+        try:
+            result = job()
+        except Exception as err:    # handed over to done
+            error = err
+
+        if done:
+            done(result, error)
+        elif error:
+            _job_error(job, error)
+
+    def close(self) -> None:
+        """Nothing to stop"""
+
+
+class ThreadRunner:
+    """Run the jobs one after the other on a worker thread
+The worker owns the device, after(ms, func) (e.g. Tk.after) polls the
+results, so done is called in the mainloop without blocking it."""
+
+    def __init__(self, after) -> None:
+
+        self._after = after
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._pending = 0       # jobs whose done was not called yet
+        self._polling = False   # poll is scheduled
+        self._thread = threading.Thread(
+            target=self._work, name='scope-runner', daemon=True)
+        self._thread.start()
+
+    def submit(self, job, done=None) -> None:
+        """Queue job, done is called back in the mainloop"""
+
+        self._jobs.put((job, done))
+        self._pending += 1
+        self._schedule()
+
+    def poll(self) -> None:
+        """Call done of the finished jobs, from the mainloop"""
+
+        self._polling = False
+        while True:
+            try:
+                job, done, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+
+            self._pending -= 1
+            if done:
+                done(result, error)
+            elif error:
+                _job_error(job, error)
+
+        if self._pending > 0:
+            self._schedule()
+
+    def close(self) -> None:
+        """Stop the worker after the queued jobs"""
+
+        self._jobs.put(None)
+        self._thread.join()
+
+    def _schedule(self) -> None:
+
+        if not self._polling:
+            self._polling = True
+            self._after(POLL_TIME, self.poll)
+
+    def _work(self) -> None:
+
+        while True:
+            item = self._jobs.get()
+            if item is None:
+                break
+
+            job, done = item
+            result, error = None, None
+            try:
+                result = job()
+            except Exception as err:    # handed over to done
+                _logger.debug("job error %r", err)
+                error = err
+            self._results.put((job, done, result, error))
+
+
+def _job_error(job, error: Exception) -> None:
+    """Error of a job that has no done to take it"""
+
+    _logger.error("job %s failed: %r", getattr(job, '__qualname__', job),
+                  error, exc_info=error)
+
+
+_logger = log.setup_log('runner')
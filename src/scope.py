@@ -4,6 +4,7 @@
 
 import argparse
 import time
+import zlib
 from array import array
 from datetime import datetime
 from pprint import pprint
@@ -15,6 +16,8 @@ import waveform
 
 CH1 = 0x01
 CH2 = 0x02
+SETTLE_DELAY = .1   # s, before the first sample request
+SETTINGS_MAX_AGE = 5.   # s, then the settings are read again
 
 PARSER = argparse.ArgumentParser()
 PARSER.add_argument('-a', '--alarm', help='buzzer alarm', action='store_true')
@@ -41,10 +44,23 @@ class Scope:
 
     _dso: dso.Dso = None
     _settings: settings.Settings = None
+    _fingerprint: int = None    # crc32 of the raw settings
+    _raw_settings: array = None
+    _settings_time = 0.         # time.monotonic() of the last settings read
+    _settings_epoch = 0         # dso.Dso.settings_epoch of the settings
 
-    def __init__(self, verbose=False) -> None:
+    def __init__(self, verbose=False, device=None, threaded=False,
+                 settings_max_age: float = SETTINGS_MAX_AGE,
+                 select: dso.ScopeId = None) -> None:
 
         self._verbose = verbose
+        self._device = device   # see dso.Dso
+        self._select = select
+        self._threaded = threaded
+        self.timings = {}   # seconds per stage of the last read
+        self.settings_max_age = settings_max_age
+        self.settle_delay = dso.AdaptiveDelay(SETTLE_DELAY)
+        self.sample_delay = dso.AdaptiveDelay(dso.SAMPLE_DELAY)  # by SecDIV
 
     def show_measure(self) -> None:
         """Show measure data on Oscilloscope"""
@@ -61,43 +77,38 @@ class Scope:
         if self._verbose:
             print(msg)
 
-    def dual(self) -> list:  # waveform.Wave
-        """Read dual channel"""
-
-        out = []
-        for chan in range(2):
-            data = self.read(chan + 1)
-            out.append(data)
+    def dual(self, pipelined: bool = True) -> list:  # waveform.Wave
+        """Read dual channel
+Pipelined, CH2 is requested as soon as the CH1 data is received and CH1
+is analysed while CH2 is acquired. Otherwise the channels are read one
+after the other. See timings for the stages."""
+
+        self.timings = {}
+        start = time.perf_counter()
+        if not pipelined:
+            out = [self.read(CH1), self.read(CH2)]
+            self.timings['total'] = time.perf_counter() - start
+            return out
+
+        self._prepare(CH1)
+        sent = self.request(CH1)
+        received = self.receive(CH1, sent)
+
+        sent = self.request(CH2)
+        out = [self.finish(received, CH1)]
+        received = self.receive(CH2, sent)
+        out.append(self.finish(received, CH2))
+        self.timings['total'] = time.perf_counter() - start
 
         return out
 
     def read(self, channel: int) -> waveform.Wave:
         """Read a single channel"""
 
-        dev = self._get_dev()
-
-        if not self._settings:
-            self.dso_settings()
-        time.sleep(.1)
-
-        chan = channel - 1
-        dev.sample(chan)
-        data, resp = dev.get_sample()
-        if resp != chan:
-            _logger.warning("wrong chan %d -> %d (%d)", chan, resp, len(data))
-            data, resp = dev.get_sample()
-            if resp != chan:
-                _logger.warning("wrong chan again %d -> %d", chan, resp)
-
-        wave = waveform.get_wave_form(data)
-        chx_key = 'CH{}_VOLTDIV'.format(channel)
-        if self._settings \
-                and chx_key in self._settings \
-                and resp == chan:
-            vdiv = self._settings[chx_key]
-            wave.vpp = round(wave.p2p * settings.VoltMULTIPLY[vdiv].value, 4)
+        self._prepare(channel)
+        sent = self.request(channel)
 
-        return wave
+        return self.finish(self.receive(channel, sent), channel)
 
     def dso_settings(self) -> dict:
         """Read DSO settings
@@ -106,17 +117,63 @@ class Scope:
 
         dev = self._get_dev()
 
+        epoch = dev.settings_epoch
         dev.settings_request()
         data = dev.get_settings()
         if len(data) != 213:
             return None
 
+        fingerprint = zlib.crc32(data)
+        self._settings_time = time.monotonic()
+        self._settings_epoch = epoch
+        if fingerprint == self._fingerprint:
+            return dict(self._settings, raw=data)
+
+        if self._fingerprint is not None:
+            _logger.info("settings changed %08x -> %08x",
+                         self._fingerprint, fingerprint)
+        self._fingerprint = fingerprint
+        self._raw_settings = data
         sett = settings.create(data)
         self._settings = sett.copy()
         del self._settings['raw']
 
         return sett
 
+    @property
+    def settings_block(self) -> tuple:
+        """(fingerprint, raw 213 bytes) of the cached settings"""
+
+        return self._fingerprint, self._raw_settings
+
+    def settings_stale(self) -> bool:
+        """The cached settings are missing, too old or a key that changes
+them was pressed"""
+
+        if not self._settings or not self._dso:
+            return True
+
+        if self._settings_epoch != self._dso.settings_epoch:
+            return True
+
+        return time.monotonic() - self._settings_time > self.settings_max_age
+
+    def revalidate(self) -> bool:
+        """Read the settings again when stale, e.g. in the idle time
+between reads. Returns True when they changed."""
+
+        if not self._dso or not self.settings_stale():
+            return False
+
+        fingerprint = self._fingerprint
+        try:
+            self.dso_settings()
+        except dso.SampleLostError:
+            _logger.info("revalidate settings lost")
+            return False
+
+        return self._fingerprint != fingerprint
+
     def close(self) -> None:
         """Close device"""
 
@@ -125,12 +182,106 @@ class Scope:
             self._dso.close()
             self._dso = None
         self._settings = None
+        self._fingerprint = None
+        self._raw_settings = None
+
+    def ready(self) -> None:
+        """Open the device and read the settings when stale
+The steps of a read are ready, the settle_wait delay, request, the
+reply_wait delay, receive and finish. read and dual sleep the delays,
+an asyncio front end awaits them instead."""
+
+        self._get_dev()
+        if self.settings_stale():
+            self.dso_settings()
+
+    def settle_wait(self) -> float:
+        """Seconds to wait after ready before the first request"""
+
+        return self.settle_delay.delay()
+
+    def request(self, channel: int) -> float:
+        """Send a sample request, returns the time it was sent"""
+
+        self._dso.sample(channel - 1, wait=False)
+
+        return time.perf_counter()
+
+    def reply_wait(self, sent: float) -> float:
+        """Seconds left until the data requested at sent is acquired"""
+
+        left = sent + self.sample_delay.delay(self._timebase()) \
+            - time.perf_counter()
+
+        return max(left, 0.)
+
+    def receive(self, channel: int, sent: float, wait: bool = True) -> tuple:
+        """Read the data requested at sent, after the reply_wait delay
+unless wait is False. Returns (analyzer, responding channel, samples)
+for finish."""
+
+        chan = channel - 1
+        name = 'ch{}_'.format(channel)
+        timebase = self._timebase()
+        if wait:
+            self.sample_delay.wait(sent, timebase)
+
+        dev = self._dso
+        start = time.perf_counter()
+        self.timings[name + 'wait'] = start - sent
+        analyzer = waveform.WaveAnalyzer()
+        data, resp = dev.get_sample(analyzer)
+        if resp != chan:
+            _logger.warning("wrong chan %d -> %d (%d)", chan, resp, len(data))
+            data, resp = dev.get_sample(analyzer)
+            if resp != chan:
+                _logger.warning("wrong chan again %d -> %d", chan, resp)
+        end = time.perf_counter()
+        self.timings[name + 'transfer'] = end - start
+
+        if resp == chan and data:
+            self.sample_delay.success(timebase, dev.reply_time - sent)
+            self.settle_delay.success()
+        else:
+            self.sample_delay.failure(timebase)
+            self.settle_delay.failure()
+
+        return analyzer, resp, data
+
+    def finish(self, received: tuple, channel: int) -> waveform.Wave:
+        """Analyse the data of receive"""
+
+        analyzer, resp, data = received
+        start = time.perf_counter()
+        wave = analyzer.finish()
+        wave.raw = data
+        if resp == channel - 1:
+            wave.vpp = settings.vpp(self._settings, channel, wave.p2p)
+        self.timings['ch{}_analysis'.format(channel)] = \
+            time.perf_counter() - start
+
+        return wave
+
+    def _prepare(self, channel: int) -> None:
+        """ready and the settle delay"""
+
+        self.ready()
+        start = time.perf_counter()
+        self.settle_delay.wait(start)
+        self.timings['ch{}_settle'.format(channel)] = \
+            time.perf_counter() - start
+
+    def _timebase(self) -> settings.SecDIV:
+
+        return self._settings.get('SECDEV') if self._settings else None
 
     def _get_dev(self):
         """Get DSO instance"""
 
         if not self._dso:
-            self._dso = dso.Dso(self._verbose)
+            self._dso = dso.Dso(self._verbose, self._device,
+                                threaded=self._threaded,
+                                select=self._select)
 
         self._dso.setup()
 
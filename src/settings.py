@@ -137,3 +137,13 @@ def create(data: array) -> dict:
         out[voltdiv] = val.name
 
     return out
+
+
+def vpp(sett: dict, channel: int, p2p: int) -> float:
+    """Peak to peak voltage of a channel (1 - CH1, 2 - CH2)"""
+
+    voltdiv = 'CH{}_VOLTDIV'.format(channel)
+    if not sett or voltdiv not in sett:
+        return None
+
+    return round(p2p * VoltMULTIPLY[sett[voltdiv]].value, 4)
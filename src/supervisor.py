@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+"""Drive several DSOs from one PC
+Every scope found by dso.find_scopes gets its own worker process that
+reads both channels and judges them like the controller. The verdicts of
+all stations come out of one queue, a crashed worker is started again.
+With discover the scopes are looked up again every RESCAN_TIME, a new one
+gets a worker too.
+
+    sup = Supervisor(dso.find_scopes(), discover=dso.find_scopes)
+    sup.start()
+    for report in sup.reports(60):
+        print(report)
+    sup.stop()
+"""
+
+import argparse
+import multiprocessing
+import queue
+import time
+from dataclasses import dataclass
+
+import dso
+import log
+import scope
+from verdict import Verdict, judge
+
+PARSER = argparse.ArgumentParser('supervisor')
+PARSER.add_argument('-l', '--list', help='List the connected scopes',
+                    action='store_true')
+PARSER.add_argument('-t', '--time', type=float, default=0,
+                    help='Run for seconds (default: until Ctrl+C)')
+PARSER.add_argument('-i', '--interval', type=float, default=.5,
+                    help='Seconds between reads of a station')
+PARSER.add_argument('--sim', type=int, default=0, metavar='STATIONS',
+                    help='Simulated scopes instead of the USB ones')
+
+
+POLLING_TIME = .5       # s, between reads of a station
+RESTART_DELAY = 2.      # s, before a crashed worker is started again
+CHECK_TIME = .2         # s, worker liveness check
+RESCAN_TIME = 5.        # s, between the look ups of new scopes
+
+
+@dataclass
+class Report:
+    """Verdict of one read, verdict is None when error is set"""
+
+    station: dso.ScopeId
+    time: float
+    verdict: Verdict = None
+    vpp: tuple = ()
+    error: str = None
+
+
+class Supervisor:
+    """Worker process per station
+device: function returning a pyusb like device for a station, e.g.
+a dsosim.SimDevice, it has to be picklable
+discover: function returning the connected stations, e.g. dso.find_scopes
+A station with a serial number keeps its worker when it is plugged in
+again elsewhere, the worker finds it by the serial. Without one the new
+position is a new station, the worker of the old one reports errors."""
+
+    def __init__(self, stations: list, interval: float = POLLING_TIME,
+                 device=None, discover=None) -> None:
+
+        self.stations = []
+        self.interval = interval
+        self.restarts = {}
+        self._device = device
+        self._discover = discover
+        self._scanned = time.monotonic()
+        for station in stations:
+            self._add(station)
+        self._reports = multiprocessing.Queue()
+        self._stop = multiprocessing.Event()
+        self._workers = {}
+        self._running = False
+        self._died = {}     # station: time.monotonic() of the crash
+
+    def start(self) -> None:
+        """Start a worker for every station"""
+
+        self._stop.clear()
+        self._running = True
+        for station in self.stations:
+            self._start(station)
+
+    def stop(self) -> None:
+        """Stop the workers"""
+
+        self._stop.set()
+        self._running = False
+        for worker in self._workers.values():
+            worker.join(self.interval + RESTART_DELAY)
+            if worker.is_alive():
+                worker.terminate()
+        self._workers = {}
+
+    def check(self) -> None:
+        """Start the crashed workers again after RESTART_DELAY, and the
+workers of new stations"""
+
+        now = time.monotonic()
+        if self._discover and now - self._scanned >= RESCAN_TIME:
+            self._scanned = now
+            self.rescan()
+
+        for station, worker in list(self._workers.items()):
+            if worker.is_alive() or self._stop.is_set():
+                continue
+
+            if station not in self._died:
+                _logger.warning("worker %s exited %s", station,
+                                worker.exitcode)
+                self._died[station] = now
+            elif now - self._died[station] >= RESTART_DELAY:
+                del self._died[station]
+                self.restarts[station] += 1
+                self._start(station)
+
+    def rescan(self) -> list:
+        """Add the stations of discover, returns the new ones"""
+
+        try:
+            found = self._discover()
+        except dso._usb().core.USBError as err:
+            _logger.error("rescan failed: %s", err)
+            return []
+
+        new = [station for station in found if self._add(station)]
+        for station in new:
+            _logger.info("new station %s", station)
+            if self._running:
+                self._start(station)
+
+        return new
+
+    def reports(self, duration: float = None):
+        """Yield the reports of all stations for duration seconds"""
+
+        end = None if duration is None else time.monotonic() + duration
+        while end is None or time.monotonic() < end:
+            self.check()
+            wait = CHECK_TIME
+            if end is not None:
+                wait = max(0, min(wait, end - time.monotonic()))
+            try:
+                yield self._reports.get(timeout=wait)
+            except queue.Empty:
+                continue
+
+    def _add(self, station: dso.ScopeId) -> bool:
+        """False when the station is known, by its serial if it has one"""
+
+        if any(_same(station, known) for known in self.stations):
+            return False
+
+        self.stations.append(station)
+        self.restarts[station] = 0
+        return True
+
+    def _start(self, station: dso.ScopeId) -> None:
+
+        worker = multiprocessing.Process(
+            target=_work, name='dso-{}'.format(station), daemon=True,
+            args=(station, self._reports, self._stop, self.interval,
+                  self._device))
+        worker.start()
+        self._workers[station] = worker
+        _logger.info("worker %s started (pid %d)", station, worker.pid)
+
+
+def _same(station: dso.ScopeId, other: dso.ScopeId) -> bool:
+
+    if station.serial or other.serial:
+        return station.serial == other.serial
+
+    return (station.bus, station.address) == (other.bus, other.address)
+
+
+def _work(station: dso.ScopeId, reports, stop, interval: float,
+          device=None) -> None:
+    """Read and judge a station until stop, like Controller._reading"""
+
+    if device:
+        dev = scope.Scope(device=device(station))
+    else:
+        dev = scope.Scope(select=station)
+
+    while not stop.is_set():
+        start = time.monotonic()
+        try:
+            waves = dev.dual()
+            reports.put(Report(station, time.time(), judge(waves),
+                               tuple(wave.vpp for wave in waves)))
+        except (scope.OscilloscopeNotFoundError, scope.OscilloscopeError,
+                dso.SampleLostError, dso._usb().core.USBTimeoutError) as err:
+            reports.put(Report(station, time.time(),
+                               error='{}: {}'.format(type(err).__name__, err)))
+            dev.close()
+            stop.wait(RESTART_DELAY)
+            continue
+        stop.wait(max(0, interval - (time.monotonic() - start)))
+
+    dev.close()
+
+
+def _sim_device(station: dso.ScopeId):
+    """Simulated scope of a --sim station"""
+
+    import dsosim
+
+    return dsosim.SimDevice(seed=station.address)
+
+
+_logger = log.setup_log('supervisor')
+
+
+if __name__ == '__main__':
+
+    ARGS = PARSER.parse_args()
+
+    if ARGS.sim:
+        STATIONS = [dso.ScopeId(0, ADDRESS) for ADDRESS in range(ARGS.sim)]
+        DEVICE = _sim_device
+        DISCOVER = None
+    else:
+        STATIONS = dso.find_scopes()
+        DEVICE = None
+        DISCOVER = dso.find_scopes
+
+    if ARGS.list or not STATIONS:
+        for STATION in STATIONS:
+            print(STATION, repr(STATION))
+        if not STATIONS:
+            print("DSO is not available")
+    else:
+        SUP = Supervisor(STATIONS, ARGS.interval, DEVICE, DISCOVER)
+        SUP.start()
+        try:
+            for REPORT in SUP.reports(ARGS.time or None):
+                print('{} {:10} {}'.format(
+                    time.strftime('%H:%M:%S', time.localtime(REPORT.time)),
+                    str(REPORT.station),
+                    REPORT.error or REPORT.verdict.value))
+        except KeyboardInterrupt:
+            pass
+        SUP.stop()
+        print('restarts', {str(STATION): COUNT
+                           for STATION, COUNT in SUP.restarts.items()})
@@ -0,0 +1,45 @@
+"""Synthetic DSO captures"""
+
+import math
+import random
+from array import array
+
+
+SHAPES = ('sine', 'square')
+
+
+def capture(shape: str = 'sine', length: int = 4000, period: float = 400,
+            amplitude: int = 100, noise: int = 0, phase: float = 0,
+            clip: int = 127, invert: bool = False,
+            seed: int = 0) -> array:
+    """Unsigned byte capture as the DSO sends it
+shape       sine or square
+length      number of samples
+period      samples per period
+amplitude   peak value, signed byte scale
+noise       uniform noise +/- noise
+phase       phase offset in radians
+clip        limit of the signed value, like a saturated input
+invert      upside down wave
+"""
+
+    if shape not in SHAPES:
+        raise ValueError('Unknown shape {}'.format(shape))
+
+    rnd = random.Random(seed)
+    clip = min(clip, 127)
+    if invert:
+        amplitude = -amplitude
+
+    out = array('B', bytes(length))
+    for idx in range(length):
+        val = math.sin(2 * math.pi * idx / period + phase)
+        if shape == 'square':
+            val = 1 if val >= 0 else -1
+        val = int(val * amplitude)
+        if noise:
+            val += rnd.randint(-noise, noise)
+        val = max(-clip - 1, min(clip, val))
+        out[idx] = val & 0xFF
+
+    return out
@@ -0,0 +1,55 @@
+"""Test asyncio scope with the DSO simulator"""
+
+import asyncio
+import time
+import unittest
+
+import aioscope
+import dsosim
+import waveform
+from verdict import Verdict, judge
+
+
+class TestAsyncScopeMethods(unittest.TestCase):
+    """AsyncScope tester"""
+
+    def test_concurrent(self):
+        """Several scopes read at the same time"""
+
+        async def run():
+            devs = [aioscope.AsyncScope(device=dsosim.SimDevice(latency=.2))
+                    for _ in range(3)]
+            await asyncio.gather(*[dev.dso_settings() for dev in devs])
+            start = time.monotonic()
+            results = await asyncio.gather(*[dev.dual() for dev in devs])
+            elapsed = time.monotonic() - start
+            await asyncio.gather(*[dev.close() for dev in devs])
+            return results, elapsed
+
+        results, elapsed = asyncio.run(run())
+
+        self.assertEqual([judge(waves) for waves in results],
+                         [Verdict.OK] * 3)
+        self.assertLess(elapsed, .2 * 2 * 2)    # not one after the other
+
+    def test_timeout(self):
+        """A timed out read does not spoil the next one"""
+
+        async def run():
+            sim = dsosim.SimDevice(latency=.3)
+            dev = aioscope.AsyncScope(device=sim)
+            with self.assertRaises(asyncio.TimeoutError):
+                await dev.read(1, timeout=.05)
+            sim.latency = 0
+            wave = await dev.read(2)
+            await dev.close()
+            return wave
+
+        wave = asyncio.run(run())
+
+        self.assertEqual(wave.typ, waveform.WaveType.SQUARE)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
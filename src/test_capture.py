@@ -0,0 +1,160 @@
+"""Test capture segments"""
+
+import os
+import tempfile
+import unittest
+
+import capture
+import dsosim
+import regrade
+import synth
+from verdict import Verdict
+
+
+class TestCaptureMethods(unittest.TestCase):
+    """Capture recorder and segment tester"""
+
+    def setUp(self):
+
+        self._dir = tempfile.TemporaryDirectory()
+        self.path = self._dir.name
+        self.sine = synth.capture('sine', noise=5)
+        self.square = synth.capture('square', noise=5, seed=1)
+        self.settings = dsosim.default_settings()
+
+    def tearDown(self):
+
+        self._dir.cleanup()
+
+    def _record(self, compress: bool, count: int = 3, **kwargs) -> str:
+
+        with capture.Recorder(self.path, compress, **kwargs) as rec:
+            for idx in range(count):
+                rec.record(self.sine, self.square, 0x1234, self.settings,
+                           Verdict.OK if idx else Verdict.NOT_SYNC,
+                           timestamp=1000 + idx)
+            return rec.path
+
+    def test_round_trip(self):
+        """Samples, settings once, verdicts and times"""
+
+        for compress in (False, True):
+            with self.subTest(compress=compress):
+                path = self._record(compress)
+                with capture.Segment(path) as seg:
+                    records = list(seg)
+                    kinds = [record.kind for record in records]
+                    captures = list(seg.captures())
+                    self.assertEqual(kinds, [capture.SETTINGS] +
+                                     [capture.CAPTURE] * 3)
+                    self.assertEqual(len(seg), 4)
+                    self.assertEqual(bytes(seg.settings(0x1234)),
+                                     self.settings.tobytes())
+                    self.assertEqual([rec.verdict for rec in captures],
+                                     [Verdict.NOT_SYNC, Verdict.OK,
+                                      Verdict.OK])
+                    self.assertEqual(captures[2].time, 1002)
+                    self.assertEqual(bytes(captures[1].ch1),
+                                     self.sine.tobytes())
+                    self.assertEqual(bytes(seg[3].ch2),
+                                     self.square.tobytes())
+                    if not compress:
+                        self.assertIsInstance(captures[0].ch1, memoryview)
+
+    def test_settings(self):
+        """Settings blocks looked up in one pass, a miss too"""
+
+        path = self._record(True)
+        with capture.Segment(path) as seg:
+            reads = []
+            read = seg._read
+            seg._read = lambda offset: reads.append(offset) or read(offset)
+            for _ in range(3):
+                self.assertIsNone(seg.settings(0))
+            self.assertEqual(len(reads), len(seg))
+            with seg.settings(0x1234) as block:
+                self.assertEqual(bytes(block), self.settings.tobytes())
+            self.assertEqual(len(reads), len(seg))
+
+    def test_close(self):
+        """A payload view in use keeps the segment open"""
+
+        path = self._record(False)
+        seg = capture.Segment(path)
+        records = list(seg)
+        samples = records[1].ch1
+        with self.assertRaises(BufferError):
+            seg.close()
+
+        samples.release()
+        seg.close()
+        with self.assertRaises(ValueError):
+            bytes(records[1].ch1)
+
+    def test_verdict_codes(self):
+        """The codes on disk do not follow the Verdict order"""
+
+        self.assertEqual({verdict.name: code for verdict, code
+                          in capture.VERDICT_CODES.items()},
+                         {'OK': 1, 'NOT_SYNC': 2, 'LOW_VOLTAGE': 3,
+                          'UNKNOWN_WAVE': 4, 'NO_SINE': 5})
+        self.assertEqual(set(capture.VERDICT_CODES), set(Verdict))
+
+        path = self._record(False, count=1)
+        with open(path, 'r+b') as outfile:    # verdict code of the capture
+            offset = len(capture.MAGIC) + capture.RECORD.size \
+                + len(self.settings) + 2
+            outfile.seek(offset)
+            self.assertEqual(outfile.read(1), bytes([2]))
+            outfile.seek(offset)
+            outfile.write(bytes([5]))
+        with capture.Segment(path) as seg:
+            self.assertEqual(seg[1].verdict, Verdict.NO_SINE)
+
+    def test_compress(self):
+        """Delta and zlib make captures smaller"""
+
+        self.sine = synth.capture('sine')
+        self.square = synth.capture('square')
+        sizes = [os.path.getsize(self._record(compress))
+                 for compress in (False, True)]
+
+        self.assertLess(sizes[1], sizes[0] / 2)
+
+    def test_cut(self):
+        """A record cut by a crash is left out, without the index too"""
+
+        path = self._record(False)
+        with open(path, 'ab') as outfile:
+            outfile.write(capture.RECORD.pack(
+                capture.CAPTURE, 0, 1, 0, 0, 4000, 4000, 4000, 4000))
+            outfile.write(bytes(100))
+        os.remove(capture._index_path(path))
+
+        with capture.Segment(path) as seg:
+            self.assertEqual(len(seg), 4)
+            self.assertEqual(len(list(seg.captures())), 3)
+
+    def test_rollover(self):
+        """A new segment when the current one is full"""
+
+        self._record(False, count=4, max_size=10000)
+        segments = [name for name in os.listdir(self.path)
+                    if name.endswith(capture.SEGMENT_EXT)]
+
+        self.assertEqual(len(segments), 2)
+
+    def test_regrade(self):
+        """Segment records graded again"""
+
+        path = self._record(True)
+        results = sorted(regrade.regrade(path, jobs=1))
+
+        self.assertEqual([result[1] for result in results], [Verdict.OK] * 3)
+        self.assertEqual([result[2] for result in results],
+                         ['NOT_SYNC', 'OK', 'OK'])
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,188 @@
+"""Test controller with the DSO simulator and a fake GUI"""
+
+import tempfile
+import threading
+import time
+import unittest
+
+import capture
+import controller
+import dsosim
+import runner
+from ng_state import NgState
+from verdict import Verdict
+
+
+class _Gui:
+    """GUI callbacks, after() timers run in order of their due time"""
+
+    def __init__(self):
+
+        self.states = []
+        self.devices = []
+        self.timers = runner.Timers()
+
+    def callbacks(self, after: bool = True) -> dict:
+
+        out = {
+            'ng': self.ng,
+            'reading': lambda text: None,
+            'device': self.devices.append,
+            'channels': lambda states: None,
+            'disable_buttons': lambda disable: None,
+        }
+        if after:
+            out['after'] = self.after
+        return out
+
+    def ng(self, state: NgState):
+
+        self.states.append(state)
+        return self
+
+    def after(self, delay: int, func) -> None:
+
+        self.timers.after(delay, func)
+
+    def run(self, steps: int = 1000) -> None:
+
+        while self.timers and steps > 0:
+            steps -= 1
+            func = self.timers.pop()
+            time.sleep(.002)    # let the runner thread work
+            func()
+
+
+class TestControllerMethods(unittest.TestCase):
+    """Controller tester"""
+
+    def _single(self, after: bool, recorder=None) -> _Gui:
+
+        gui = _Gui()
+        ctrl = controller.Controller(device=dsosim.SimDevice(),
+                                     recorder=recorder)
+        ctrl.set_callbacks(gui.callbacks(after))
+        ctrl.single()
+        gui.run()
+
+        self.assertFalse(ctrl.polling)
+        self.assertIn(NgState.OK, gui.states)
+        self.assertEqual(gui.states[-1], NgState.STOP)
+        return ctrl
+
+    def test_single_inline(self):
+        """Single read in the calling thread"""
+
+        ctrl = self._single(after=False)
+        self.assertIsInstance(ctrl._runner, runner.InlineRunner)
+
+    def test_single_thread(self):
+        """Single read on the runner thread"""
+
+        ctrl = self._single(after=True)
+        self.assertIsInstance(ctrl._runner, runner.ThreadRunner)
+        ctrl._runner.close()
+
+    def test_revalidate_error(self):
+        """A USB error of the settings check is handled like a read error"""
+
+        import usb
+
+        def unplugged():
+            raise usb.core.USBTimeoutError('Operation timed out')
+
+        gui = _Gui()
+        ctrl = controller.Controller(device=dsosim.SimDevice())
+        ctrl.set_callbacks(gui.callbacks(after=False))
+        ctrl._scope.revalidate = unplugged
+        ctrl.toggle()
+        gui.run(steps=2)
+        ctrl.toggle()
+
+        self.assertEqual(gui.states[:2], [NgState.OK, NgState.STOP])
+        self.assertTrue(any('Operation timed out' in str(text)
+                            for text in gui.devices))
+
+    def test_record(self):
+        """Every judged cycle goes to the capture segment"""
+
+        with tempfile.TemporaryDirectory() as path:
+            with capture.Recorder(path) as recorder:
+                self._single(after=False, recorder=recorder)
+                with capture.Segment(recorder.path) as seg:
+                    records = list(seg.captures())
+                    verdicts = [record.verdict for record in records]
+                    settings = seg.settings(records[-1].fingerprint)
+                    size = len(settings) if settings is not None else 0
+                    del records, settings
+
+        self.assertEqual(verdicts[-1], Verdict.OK)
+        self.assertEqual(size, 213)
+
+    def test_record_error(self):
+        """A recording error is shown once and stops the recording"""
+
+        class _Full:
+            closed = False
+            records = 0
+
+            def record(self, *_args, **_kwargs):
+                self.records += 1
+                raise OSError(28, 'No space left on device')
+
+            def close(self):
+                self.closed = True
+
+        recorder = _Full()
+        errors = []
+        gui = _Gui()
+        ctrl = controller.Controller(device=dsosim.SimDevice(),
+                                     recorder=recorder)
+        ctrl.set_callbacks(dict(gui.callbacks(after=False),
+                                error=lambda *args: errors.append(args)))
+        with self.assertLogs('oscilok.ctrl', 'ERROR'):
+            ctrl.toggle()
+            gui.run(steps=6)
+        ctrl.toggle()
+
+        self.assertEqual(recorder.records, 1)
+        self.assertTrue(recorder.closed)
+        self.assertEqual([title for title, _ in errors], ['Recording Error'])
+
+
+class TestRunnerMethods(unittest.TestCase):
+    """Runner tester"""
+
+    def test_thread(self):
+        """Jobs run on the worker, done in the polling thread"""
+
+        gui = _Gui()
+        jobs = runner.ThreadRunner(gui.after)
+        done = []
+        jobs.submit(lambda: threading.current_thread().name,
+                    lambda result, error: done.append(
+                        (result, error, threading.current_thread().name)))
+        jobs.submit(lambda: 1 / 0, lambda result, error: done.append(error))
+        gui.run()
+        jobs.close()
+
+        self.assertEqual(done[0], ('scope-runner', None,
+                                   threading.current_thread().name))
+        self.assertIsInstance(done[1], ZeroDivisionError)
+
+    def test_job_error(self):
+        """The error of a job without done is logged"""
+
+        gui = _Gui()
+        for jobs in (runner.InlineRunner(), runner.ThreadRunner(gui.after)):
+            with self.subTest(runner=type(jobs).__name__):
+                with self.assertLogs('oscilok.runner', 'ERROR') as logs:
+                    jobs.submit(lambda: 1 / 0)
+                    gui.run()
+                    jobs.close()
+                self.assertIn('ZeroDivisionError', logs.output[0])
+
+
+if __name__ == '__main__':
+
+    unittest.main()
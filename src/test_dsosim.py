@@ -0,0 +1,396 @@
+"""Test DSO simulator with the acquisition path"""
+
+import io
+import time
+import unittest
+from array import array
+
+import dso
+import dsosim
+import message
+import scope
+import settings
+import waveform
+from verdict import Verdict, judge
+
+
+class TestDsoSimMethods(unittest.TestCase):
+    """DSO simulator tester"""
+
+    threaded = False
+
+    def setUp(self):
+
+        self.sim = dsosim.SimDevice()
+        self.dev = dso.Dso(device=self.sim, threaded=self.threaded)
+        self.dev.setup()
+
+    def tearDown(self):
+
+        self.dev.close()
+
+    def test_echo(self):
+        """0x00 echo"""
+
+        self.dev.echo('hi')
+        msg = self.dev.read_message()
+
+        self.assertEqual(msg.command, 0x80)
+        self.assertEqual(msg.data, array('B', b'hi'))
+        self.assertTrue(msg.checksum)
+
+    def test_sample(self):
+        """0x02 sample data"""
+
+        self.dev.sample(1)
+        data, chan = self.dev.get_sample()
+
+        self.assertEqual(chan, 1)
+        self.assertEqual(data, self.sim.waveforms[1])
+
+    def test_buffer_pool(self):
+        """Receive buffers are reused, released data cannot be read"""
+
+        allocated = self.dev.pool.allocated
+        for _ in range(3):
+            self.dev.sample(0, wait=False)
+            self.dev.get_sample()
+        self.assertEqual(self.dev.pool.allocated, allocated)
+
+        self.dev.echo('hi')
+        msg = self.dev.read_message()
+        data = msg.data
+        self.dev.release(msg)
+        self.assertIsNone(msg.data)
+        with self.assertRaises(ValueError):
+            data.tolist()
+
+    def test_stream(self):
+        """Replies merged into one read or split across reads"""
+
+        for merge, read_size in ((True, None), (False, 300), (True, 700)):
+            self.sim.merge, self.sim.read_size = merge, read_size
+            self.dev.sample(1, wait=False)
+            data, chan = self.dev.get_sample()
+            self.dev.echo('hi')
+            msg = self.dev.read_message()
+
+            self.assertEqual(chan, 1)
+            self.assertEqual(data, self.sim.waveforms[1])
+            self.assertEqual(msg.data, array('B', b'hi'))
+
+    def test_short_read(self):
+        """A short read into a reused buffer does not see the old packet"""
+
+        if self.threaded:
+            self.skipTest('the reader thread has its own buffer')
+
+        text = 'x' * 1000
+        self.dev.echo(text)
+        self.dev.release(self.dev.read_message())
+
+        self.sim.read_size = 500    # the same packet again, in two reads
+        self.dev.echo(text)
+        msg = self.dev.read_message()
+
+        self.assertEqual(msg.data, array('B', text.encode()))
+        self.assertEqual(self.dev._decoder.skipped, 0)
+        self.assertEqual(self.dev.pool.allocated, dso.POOL_SIZE)
+
+    def test_download(self):
+        """0x10 file and 0x20 screenshot streamed to a sink"""
+
+        self.sim.files['/app/dso.log'] = content = bytes(range(7)) * 500
+        out = io.BytesIO()
+        sizes = []
+        size = self.dev.download_file('/app/dso.log', out, sizes.append)
+
+        self.assertEqual(size, len(content))
+        self.assertEqual(out.getvalue(), content)
+        self.assertEqual(sizes, [0, 999, 1999, 2999, 3499, 3500])
+        self.assertEqual(self.dev.read_file('/app/dso.log'), content)
+
+        out = io.BytesIO()
+        self.dev.download_screenshot(out)
+        self.assertEqual(out.getvalue(), self.sim.screenshot)
+
+    def test_download_error(self):
+        """Unknown file, the 0x01 status is not data"""
+
+        out = io.BytesIO()
+        sizes = []
+        with self.assertRaises(FileNotFoundError) as ctx:
+            self.dev.download_file('/nothing', out, sizes.append)
+        self.assertEqual(out.getvalue(), b'')
+        self.assertEqual(sizes, [])
+        self.assertIsInstance(ctx.exception.__cause__, dso.DownloadError)
+        self.assertEqual(ctx.exception.__cause__.status, dso.FILE_NOT_FOUND)
+
+        # the device is in sync after the error
+        self.sim.files['/app/dso.log'] = b'log'
+        self.assertEqual(self.dev.read_file('/app/dso.log'), b'log')
+
+    def test_wrong_channel(self):
+        """Reply from the other channel"""
+
+        self.sim.wrong = 1
+        self.dev.sample(0)
+        data, chan = self.dev.get_sample()
+
+        self.assertEqual(chan, 1)
+        self.assertEqual(data, self.sim.waveforms[1])
+
+    def test_stopped(self):
+        """STOP mode has no sample data"""
+
+        self.sim.stopped = True
+        self.dev.sample(0)
+        data, chan = self.dev.get_sample()
+        msg = self.dev.read_message()
+
+        self.assertEqual(chan, 0)
+        self.assertEqual(len(data), 0)
+        self.assertIsNone(msg)
+
+    def test_scope_dual(self):
+        """Both channels through Scope"""
+
+        self.dev.close()
+        dev = scope.Scope(device=self.sim, threaded=self.threaded)
+        sett = dev.dso_settings()
+        waves = dev.dual()
+        dev.close()
+
+        self.assertEqual(sett['CH1_VOLTDIV'], 'V2')
+        self.assertEqual(len(sett['raw']), dsosim.SETTINGS_LEN)
+        self.assertEqual([wave.typ for wave in waves],
+                         [waveform.WaveType.SINE, waveform.WaveType.SQUARE])
+        self.assertGreater(waves[0].vpp, 10)
+        self.assertEqual(judge(waves), Verdict.OK)
+        self.assertEqual(self.sim.stats['dropped'], 0)
+
+    def test_pipelined_dual(self):
+        """Pipelined and sequential reads give the same waves"""
+
+        self.dev.close()
+        dev = scope.Scope(device=self.sim, threaded=self.threaded)
+        waves = dev.dual(pipelined=False)
+        sequential = dev.timings
+        pipelined = dev.dual()
+        dev.close()
+
+        self.assertEqual([wave.typ for wave in pipelined],
+                         [wave.typ for wave in waves])
+        self.assertEqual([wave.p2p for wave in pipelined],
+                         [wave.p2p for wave in waves])
+        self.assertIn('ch2_settle', sequential)
+        self.assertNotIn('ch2_settle', dev.timings)
+        self.assertLess(dev.timings['total'], sequential['total'])
+
+
+class TestThreadedDso(TestDsoSimMethods):
+    """Same tests with the background reader"""
+
+    threaded = True
+
+    def test_deadline(self):
+        """get_sample gives up at its deadline, the late reply is queued"""
+
+        self.sim.latency = .3
+        self.dev.sample(0, wait=False)
+        start = time.monotonic()
+        data, chan = self.dev.get_sample(t_out_ms=50)
+
+        self.assertLess(time.monotonic() - start, .25)
+        self.assertEqual((len(data), chan), (0, -2))
+
+        data, chan = self.dev.get_sample()
+        self.assertEqual(chan, 0)
+        self.assertEqual(data, self.sim.waveforms[0])
+
+    def test_reader_error(self):
+        """The reads raise the USB error that stopped the reader"""
+
+        import usb
+
+        def unplugged(*_args):
+            raise usb.core.USBError('No such device')
+
+        self.sim.read = unplugged
+        for _ in range(2):
+            start = time.monotonic()
+            with self.assertRaises(usb.core.USBError):
+                self.dev.get_sample(t_out_ms=2000)
+            self.assertLess(time.monotonic() - start, 1)
+        self.assertIn('No such device', self.dev.error)
+
+
+class TestAdaptiveDelay(unittest.TestCase):
+    """Learnt reply delays"""
+
+    def test_learn(self):
+        """The wait follows the reply latency, a failure backs off"""
+
+        delay = dso.AdaptiveDelay(.1, minimum=.01, step=.5, margin=.02)
+        for _ in range(5):
+            delay.success('fast', .05)
+        self.assertAlmostEqual(delay.delay('fast'), .03)
+        self.assertAlmostEqual(delay.latency['fast'], .05)
+        self.assertEqual(delay.delay('slow'), .1)
+
+        delay.failure('fast')
+        self.assertEqual(delay.delay('fast'), .1)
+        self.assertNotIn('fast', delay.latency)
+        delay.success('fast', .05)
+        self.assertAlmostEqual(delay.delay('fast'), .06)    # floor
+
+        for _ in range(5):
+            delay.success('settle')
+        self.assertAlmostEqual(delay.delay('settle'), .01)
+
+    def test_scope(self):
+        """Scope reads get quicker, a wrong reply backs off"""
+
+        sim = dsosim.SimDevice(latency=.08)
+        dev = scope.Scope(device=sim)
+        for _ in range(3):
+            self.assertEqual(judge(dev.dual()), Verdict.OK)
+        timebase = settings.SecDIV.US400
+        self.assertLess(dev.sample_delay.delay(timebase), dso.SAMPLE_DELAY)
+        self.assertGreater(dev.sample_delay.delay(timebase),
+                           .08 - dso.LATENCY_MARGIN - .01)
+        self.assertLess(dev.settle_delay.delay(), scope.SETTLE_DELAY)
+
+        sim.wrong = 1
+        dev.read(scope.CH1)
+        dev.close()
+        self.assertEqual(dev.sample_delay.delay(timebase), dso.SAMPLE_DELAY)
+
+
+class TestSettingsCache(unittest.TestCase):
+    """Scope settings cache"""
+
+    def setUp(self):
+
+        self.sim = dsosim.SimDevice()
+        self.dev = scope.Scope(device=self.sim, settings_max_age=60)
+        self.vpp = self.dev.read(scope.CH1).vpp
+
+    def tearDown(self):
+
+        self.dev.close()
+
+    def _volt_div(self, volt_div: settings.VoltDIVx1) -> None:
+
+        self.sim.settings[settings.Settings.CH1_VOLTDIV.value] = \
+            volt_div.value
+
+    def test_cached(self):
+        """No settings request while fresh"""
+
+        writes = self.sim.stats['write']
+        self._volt_div(settings.VoltDIVx1.V5)
+        self.assertEqual(self.dev.read(scope.CH1).vpp, self.vpp)
+        self.assertFalse(self.dev.revalidate())
+        self.assertEqual(self.sim.stats['write'] - writes, 1)
+
+    def test_keypress(self):
+        """A settings key invalidates the cache"""
+
+        self._volt_div(settings.VoltDIVx1.V5)
+        self.dev.show_measure()
+        self.assertFalse(self.dev.settings_stale())
+
+        self.dev._get_dev().keypress_trigger(dso.Key.AUTOSET)
+        self.assertTrue(self.dev.settings_stale())
+        wave = self.dev.read(scope.CH1)
+        self.assertNotEqual(wave.vpp, self.vpp)
+        self.assertEqual(wave.vpp, settings.vpp(
+            {'CH1_VOLTDIV': 'V5'}, scope.CH1, wave.p2p))
+
+    def test_max_age(self):
+        """Old settings are read again, unchanged ones are kept"""
+
+        self.dev.settings_max_age = 0
+        self.assertFalse(self.dev.revalidate())
+        self._volt_div(settings.VoltDIVx1.V5)
+        self.assertTrue(self.dev.revalidate())
+        wave = self.dev.read(scope.CH1)
+        self.assertNotEqual(wave.vpp, self.vpp)
+        self.assertEqual(wave.vpp, settings.vpp(
+            {'CH1_VOLTDIV': 'V5'}, scope.CH1, wave.p2p))
+
+
+class TestFind(unittest.TestCase):
+    """Scope selection"""
+
+    def setUp(self):
+
+        import usb
+
+        self.core = usb.core
+        self.find = usb.core.find
+        self.serial = dso._serial
+        # the scope with serial B was plugged in again at 1-7
+        self.devs = [dsosim.SimDevice(), dsosim.SimDevice()]
+        for dev, (bus, address, serial) in zip(self.devs, [(1, 5, 'A'),
+                                                           (1, 7, 'B')]):
+            dev.bus, dev.address, dev.serial = bus, address, serial
+        usb.core.find = self._find
+        dso._serial = lambda dev: dev.serial
+
+    def tearDown(self):
+
+        self.core.find = self.find
+        dso._serial = self.serial
+
+    def _find(self, custom_match=None, **match):
+
+        for dev in self.devs:
+            if all(getattr(dev, key) == val for key, val in match.items()
+                   if key in ('bus', 'address')) \
+                    and (custom_match is None or custom_match(dev)):
+                return dev
+
+        return None
+
+    def test_serial(self):
+        """Found by the serial alone, the others by the position"""
+
+        self.assertIs(dso._find(dso.ScopeId(1, 6, 'B')), self.devs[1])
+        self.assertIs(dso._find(dso.ScopeId(1, 7)), self.devs[1])
+        self.assertIs(dso._find(dso.ScopeId(serial='A')), self.devs[0])
+        self.assertIsNone(dso._find(dso.ScopeId(1, 5, 'C')))
+        self.assertIs(dso._find(), self.devs[0])
+
+
+class TestSimPacket(unittest.TestCase):
+    """Simulator replies"""
+
+    def test_sample_replies(self):
+        """LEN, DATA and SUM messages"""
+
+        sim = dsosim.SimDevice(waveforms={0: bytes(range(250))},
+                               chunk_len=100)
+        sim.write(0x02, message.create_packet(message.Message(
+            command=0x02, subcommand=0x01, data=array('B', [0]))))
+
+        msgs = []
+        for _ in range(5):
+            buf = array('B', bytes(4096))
+            sim.read(0x81, buf)
+            msgs.append(message.build(buf))
+
+        self.assertTrue(all(msg.checksum for msg in msgs))
+        self.assertEqual([msg.subcommand for msg in msgs], [
+            message.SAMPLE_LEN_SUBCMD, message.SAMPLE_DATA_SUBCMD,
+            message.SAMPLE_DATA_SUBCMD, message.SAMPLE_DATA_SUBCMD,
+            message.SAMPLE_SUM_SUBCMD])
+        self.assertEqual(msgs[0].data, array('B', [0, 250, 0, 0]))
+        self.assertEqual(len(msgs[3].data), 51)
+        self.assertEqual(msgs[4].data[1], sum(range(250)) & 0xFF)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
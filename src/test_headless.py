@@ -0,0 +1,52 @@
+"""Test headless continuous test"""
+
+import subprocess
+import sys
+import unittest
+
+import dsosim
+import headless
+from ng_state import NgState
+
+
+class TestHeadlessMethods(unittest.TestCase):
+    """Headless tester"""
+
+    def test_lazy_imports(self):
+        """No GUI or USB module is loaded by the imports"""
+
+        code = 'import sys, headless; print(sorted(' \
+            '{"tkinter", "usb", "pynput"} & set(sys.modules)))'
+        out = subprocess.run([sys.executable, '-c', code], check=True,
+                             stdout=subprocess.PIPE, universal_newlines=True)
+
+        self.assertEqual(out.stdout.strip(), '[]')
+
+    def test_single(self):
+        """Single read with the simulator until the controller stops"""
+
+        app = headless.Headless(dsosim.SimDevice())
+        app.run(single=True, duration=10)
+
+        self.assertFalse(app.ctrl.polling)
+        self.assertEqual(app.verdict, NgState.OK)
+        self.assertEqual(app.state, NgState.STOP)
+        self.assertGreater(app.first_verdict, 0)
+
+    def test_loop(self):
+        """Timers in order of their due time, within the duration"""
+
+        loop = headless.Loop()
+        calls = []
+        loop.after(20, lambda: calls.append(2))
+        loop.after(10, lambda: calls.append(1))
+        loop.after(10, lambda: loop.after(0, lambda: calls.append(3)))
+        loop.after(1000, lambda: calls.append(4))
+        loop.run(.2)
+
+        self.assertEqual(calls, [1, 3, 2])
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -90,6 +90,79 @@ class TestStringMethods(unittest.TestCase):
         self.assertFalse(msg.response)
         self.assertEqual(msg.data, array('B', [0x11, 0x01]))
 
+    def test_zero_copy(self):
+        """Data is a view into the received packet"""
+
+        pkt = array('B', [0x53, 0x04, 0x00, 0x12, 0x01, 0x01, 0x6b, 0, 0])
+        msg = message.build(pkt)
+
+        self.assertEqual(msg, message.build(pkt))
+        self.assertFalse(hasattr(msg, '__dict__'))
+        self.assertIsInstance(msg.data, memoryview)
+        pkt[5] = 0x00
+        self.assertEqual(msg.data, array('B', [0]))
+
+    def test_incremental_checksum(self):
+        """Check sum of chunks"""
+
+        data = bytes(range(256)) * 5 + b'\x07'
+        summary = message.Checksum()
+        view = memoryview(data)
+        for idx in range(0, len(data), 300):
+            summary.update(view[idx:idx+300])
+
+        self.assertEqual(summary.digest(), message.make_sum(data))
+        self.assertEqual(summary.digest(),
+                         message.make_sum(array('B', data)))
+        self.assertEqual(message.Checksum(b'\x01\x02\xff').digest(), 2)
+        self.assertEqual(message.Checksum().digest(), 0)
+
+    def test_stream_decoder(self):
+        """Messages split across chunks, merged and after junk"""
+
+        pkts = [message.create_packet(message.Message(
+            command=0x80, data=array('B', b'abc'))).tobytes(),
+                message.create_packet(message.Message(
+            command=0x81, data=array('B', b'xy'))).tobytes()]
+        bad = bytearray(pkts[0])
+        bad[4] ^= 0xFF  # check sum error
+        decoder = message.StreamDecoder()
+
+        msgs = decoder.feed(b'\x00' + bytes(bad) + pkts[0] + pkts[1][:4])
+        self.assertEqual([msg.command for msg in msgs], [0x80])
+        self.assertEqual(msgs[0].data, array('B', b'abc'))
+        self.assertEqual(len(decoder), 4)
+        self.assertEqual(decoder.skipped, 1 + len(bad))
+
+        msgs = decoder.feed(pkts[1][4:] + pkts[0])
+        self.assertEqual([msg.command for msg in msgs], [0x81, 0x80])
+        self.assertTrue(all(msg.checksum for msg in msgs))
+        self.assertEqual(len(decoder), 0)
+
+    def test_stream_decoder_marker(self):
+        """Marker bytes among the samples do not hold back messages"""
+
+        pkt = message.create_packet(message.Message(
+            command=0x80, data=array('B', b'abc'))).tobytes()
+        decoder = message.StreamDecoder()
+
+        for junk in (b'\x53\xff\xff', b'\x43\x05\x00\x12', b'\x53\x00'):
+            with self.subTest(junk=junk):
+                msgs = decoder.feed(junk + pkt * 5)
+                self.assertEqual(len(msgs), 5)
+                self.assertEqual(len(decoder), 0)
+
+    def test_stream_decoder_borrow(self):
+        """A chunk of one message is not copied"""
+
+        pkt = array('B', [0x53, 0x04, 0x00, 0x92, 0x01, 0x01, 0xeb, 0, 0])
+        decoder = message.StreamDecoder()
+
+        msg, = decoder.feed(memoryview(pkt)[:7], borrow=True)
+        self.assertIs(msg.data.obj, pkt)
+        msg, = decoder.feed(memoryview(pkt)[:7])
+        self.assertIsNot(msg.data.obj, pkt)
+
     def test_create_screenshot_pkt(self):
         """Screenshot packet"""
 
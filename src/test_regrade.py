@@ -0,0 +1,78 @@
+"""Test Regrade"""
+
+import os
+import tempfile
+import unittest
+import zipfile
+
+import regrade
+import synth
+from verdict import Verdict
+
+
+class TestRegradeMethods(unittest.TestCase):
+    """Regrade tester"""
+
+    def setUp(self):
+
+        self._dir = tempfile.TemporaryDirectory()
+        self.path = self._dir.name
+        sine = synth.capture('sine').tobytes()
+        self.captures = {
+            'ok': (sine, synth.capture('square').tobytes(), b'OK'),
+            'ng': (sine, synth.capture('square', invert=True).tobytes(),
+                   b'OK'),
+            'flat': (sine, bytes(4000), None),
+        }
+        for name, (ch1, ch2, stored) in self.captures.items():
+            self._write(name + regrade.CH1, ch1)
+            self._write(name + regrade.CH2, ch2)
+            if stored:
+                self._write(name + regrade.VERDICT, stored)
+        self._write('lost' + regrade.CH1, sine)
+
+    def tearDown(self):
+
+        self._dir.cleanup()
+
+    def _write(self, filename, data):
+
+        with open(os.path.join(self.path, filename), 'wb') as outfile:
+            outfile.write(data)
+
+    def test_grade(self):
+        """Verdict of a single capture"""
+
+        ch1, ch2, _ = self.captures['ok']
+        self.assertEqual(regrade.grade(ch1, ch2), Verdict.OK)
+        ch1, ch2, _ = self.captures['ng']
+        self.assertEqual(regrade.grade(ch1, ch2), Verdict.NOT_SYNC)
+
+    def test_read_zip(self):
+        """Captures in an archive"""
+
+        archive = os.path.join(self.path, 'captures.zip')
+        with zipfile.ZipFile(archive, 'w') as outfile:
+            outfile.write(os.path.join(self.path, 'ok.ch1'), 'day/ok.ch1')
+            outfile.write(os.path.join(self.path, 'ok.ch2'), 'day/ok.ch2')
+
+        out = list(regrade.read_captures(archive))
+        self.assertEqual([name for name, _ in out], ['day/ok'])
+        self.assertEqual(out[0][1][regrade.CH1], self.captures['ok'][0])
+
+    def test_regrade(self):
+        """Process pool verdicts"""
+
+        out = {name: (result, stored) for name, result, stored
+               in regrade.regrade(self.path, jobs=2)}
+
+        self.assertEqual(out, {
+            'ok': (Verdict.OK, 'OK'),
+            'ng': (Verdict.NOT_SYNC, 'OK'),
+            'flat': (Verdict.UNKNOWN_WAVE, None),
+        })
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,72 @@
+"""Test replay of captures through the controller"""
+
+import unittest
+
+import controller
+import regrade
+import replay
+import synth
+from ng_state import NgState
+from verdict import Verdict
+
+
+class TestReplayMethods(unittest.TestCase):
+    """Replay tester"""
+
+    def setUp(self):
+
+        sine = synth.capture('sine').tobytes()
+        self.files = {
+            'ok': {regrade.CH1: sine,
+                   regrade.CH2: synth.capture('square').tobytes(),
+                   regrade.VERDICT: b'OK'},
+            'ng': {regrade.CH1: sine,
+                   regrade.CH2: synth.capture(
+                       'square', invert=True).tobytes(),
+                   regrade.VERDICT: b'OK'},
+            'flat': {regrade.CH1: sine, regrade.CH2: bytes(4000)},
+        }
+
+    def _play(self, names: list, single: bool = False) -> replay.Replay:
+
+        play = replay.Replay([('{}{}'.format(name, idx), self.files[name])
+                              for idx, name in enumerate(names)], single)
+        play.run()
+        return play
+
+    def test_polling(self):
+        """Verdicts every POLLING_TIME of virtual time"""
+
+        play = self._play(['ok', 'ok', 'ng', 'ok'])
+
+        self.assertEqual([cycle.verdict for cycle in play.cycles],
+                         [Verdict.OK, Verdict.OK, Verdict.NOT_SYNC,
+                          Verdict.OK])
+        self.assertEqual([cycle.state for cycle in play.cycles],
+                         [NgState.OK, NgState.OK, NgState.NG, NgState.OK])
+        self.assertEqual([cycle.time for cycle in play.cycles],
+                         [0, controller.POLLING_TIME,
+                          2 * controller.POLLING_TIME,
+                          3 * controller.POLLING_TIME])
+        self.assertEqual(play.cycles[2].stored, 'OK')
+        self.assertGreater(play.cycles_per_second, 0)
+
+    def test_single(self):
+        """Single read retries until the sine wave is lost"""
+
+        retries = controller.SINGLE_READ_TRY_COUNT - 1
+        play = self._play(['flat'] * retries + ['ok'], single=True)
+        states = [cycle.state for cycle in play.cycles]
+
+        self.assertEqual(states, [NgState.PROGRESS] * (retries - 1)
+                         + [NgState.NG, NgState.OK])
+        self.assertEqual(play.cycles[retries - 1].message,
+                         'Cannot get sine wave')
+        # the next single read when the controller is idle again
+        self.assertEqual(play.cycles[-1].time,
+                         play.cycles[-2].time + controller.POLLING_TIME)
+
+
+if __name__ == '__main__':
+
+    unittest.main()
@@ -0,0 +1,86 @@
+"""Test supervisor with simulated stations"""
+
+import subprocess
+import sys
+import unittest
+from collections import Counter
+
+import dso
+import dsosim
+import supervisor
+from verdict import Verdict
+
+
+def _device(station: dso.ScopeId):
+
+    if station.serial == 'crash':
+        raise RuntimeError('broken station')
+
+    return dsosim.SimDevice(seed=station.address)
+
+
+class TestSupervisorMethods(unittest.TestCase):
+    """Supervisor tester"""
+
+    def setUp(self):
+
+        self.restart_delay = supervisor.RESTART_DELAY
+        self.rescan_time = supervisor.RESCAN_TIME
+        supervisor.RESTART_DELAY = .1
+        supervisor.RESCAN_TIME = .1
+
+    def tearDown(self):
+
+        supervisor.RESTART_DELAY = self.restart_delay
+        supervisor.RESCAN_TIME = self.rescan_time
+
+    def test_lazy_usb(self):
+        """pyusb is not loaded by the import"""
+
+        code = 'import sys, supervisor; print("usb" in sys.modules)'
+        out = subprocess.run([sys.executable, '-c', code], check=True,
+                             stdout=subprocess.PIPE, universal_newlines=True)
+
+        self.assertEqual(out.stdout.strip(), 'False')
+
+    def test_stations(self):
+        """Verdicts of every station, a crashed one is restarted"""
+
+        stations = [dso.ScopeId(0, 1), dso.ScopeId(0, 2),
+                    dso.ScopeId(0, 3, 'crash')]
+        sup = supervisor.Supervisor(stations, interval=.05, device=_device)
+        sup.start()
+        reports = list(sup.reports(3))
+        sup.stop()
+
+        verdicts = Counter((str(report.station), report.verdict)
+                           for report in reports)
+        self.assertGreater(verdicts['0-1', Verdict.OK], 1)
+        self.assertGreater(verdicts['0-2', Verdict.OK], 1)
+        self.assertGreater(sup.restarts[stations[2]], 0)
+        self.assertEqual(sup.restarts[stations[0]], 0)
+        self.assertTrue(all(len(report.vpp) == 2 for report in reports))
+
+    def test_discover(self):
+        """A new scope gets a worker, a moved one with serial does not"""
+
+        found = [dso.ScopeId(1, 1, 'A')]
+        sup = supervisor.Supervisor(found, interval=.05, device=_device,
+                                    discover=lambda: list(found))
+        sup.start()
+        found[:] = [dso.ScopeId(1, 4, 'A'), dso.ScopeId(1, 2)]
+        reports = list(sup.reports(2))
+        sup.stop()
+
+        self.assertEqual(sup.stations, [dso.ScopeId(1, 1, 'A'),
+                                        dso.ScopeId(1, 2)])
+        verdicts = Counter((str(report.station), report.verdict)
+                           for report in reports)
+        self.assertGreater(verdicts['A', Verdict.OK], 1)
+        self.assertGreater(verdicts['1-2', Verdict.OK], 1)
+        self.assertEqual(sup.rescan(), [])
+
+
+if __name__ == '__main__':
+
+    unittest.main()
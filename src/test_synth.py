@@ -0,0 +1,61 @@
+"""Test synthetic captures"""
+
+import unittest
+from array import array
+
+import synth
+
+
+def _signed(data: array) -> list:
+
+    return list(array('b', data.tobytes()))
+
+
+class TestSynthMethods(unittest.TestCase):
+    """Synthetic capture tester"""
+
+    def test_shape(self):
+        """Length, amplitude and period of the shapes"""
+
+        sine = _signed(synth.capture('sine', 800, period=400))
+        square = _signed(synth.capture('square', 800, period=400))
+
+        self.assertEqual(len(sine), 800)
+        self.assertEqual((max(sine), min(sine)), (100, -100))
+        self.assertEqual(sine[100], 100)    # quarter period
+        self.assertEqual(sine[0], 0)
+        self.assertEqual(set(square), {100, -100})
+        self.assertEqual(square[1:200], [100] * 199)
+        self.assertEqual(square[201:400], [-100] * 199)
+        self.assertRaises(ValueError, synth.capture, 'triangle')
+
+    def test_invert(self):
+        """Upside down wave"""
+
+        for shape in synth.SHAPES:
+            with self.subTest(shape=shape):
+                wave = _signed(synth.capture(shape))
+                inverted = _signed(synth.capture(shape, invert=True))
+                self.assertEqual(inverted, [-val for val in wave])
+
+    def test_clip(self):
+        """Saturated input, the noise is clipped too"""
+
+        wave = _signed(synth.capture('sine', amplitude=200, clip=80,
+                                     noise=10))
+
+        self.assertEqual((max(wave), min(wave)), (80, -81))
+        self.assertGreater(wave.count(80), len(wave) / 4)
+
+    def test_seed(self):
+        """Same noise for the same seed"""
+
+        self.assertEqual(synth.capture(noise=10, seed=3),
+                         synth.capture(noise=10, seed=3))
+        self.assertNotEqual(synth.capture(noise=10, seed=3),
+                            synth.capture(noise=10, seed=4))
+
+
+if __name__ == '__main__':
+
+    unittest.main()
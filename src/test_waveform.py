@@ -1,8 +1,13 @@
 """Test Wave Form"""
 
+import math
+import random
 import unittest
+from array import array
 
+import synth
 import waveform
+from verdict import Verdict, judge
 
 
 class TestWaveFormMethods(unittest.TestCase):
@@ -63,6 +68,276 @@ class TestWaveFormMethods(unittest.TestCase):
         self.assertTrue(waveform._is_square_wave(inp))
         self.assertFalse(waveform._is_sine_wave(inp))
 
+    def test_average(self):
+        """Running sum gives the mean of the previous window"""
+
+        data = array('b', [random.Random(1).randint(-128, 127)
+                           for _ in range(300)])
+        for avg_len in (1, 4, 16, 64):
+            expected = [int(sum(data[idx-avg_len:idx]) / avg_len)
+                        for idx in range(avg_len, len(data))]
+            out = waveform._average(data, avg_len)
+            self.assertEqual(out.typecode, 'b')
+            self.assertEqual(out.tolist(), expected)
+
+        self.assertEqual(len(waveform._average(data[:16], 16)), 0)
+
+    def test_peak_list(self):
+        """Columns and per dot view"""
+
+        dots = [
+            waveform.Dot(0, 20),
+            waveform.Dot(10, 90, waveform.Peak.TP_ST),
+            waveform.Dot(20, 88, waveform.Peak.TP_END),
+        ]
+        peaks = waveform.PeakList(dots)
+
+        self.assertEqual(len(peaks), 3)
+        self.assertEqual(peaks.time, array('i', [0, 10, 20]))
+        self.assertEqual(peaks.peak, array('B', [0, 1, 2]))
+        self.assertEqual(peaks[-1], dots[-1])
+        self.assertEqual(peaks[1:], dots[1:])
+        self.assertEqual(peaks, dots)
+        self.assertNotEqual(peaks, dots[:2])
+        with self.assertRaises(AttributeError):
+            peaks[0].extra = 1
+
+    def test_top_sine_inside_top_square(self):
+        """Sine and square in phase and opposite"""
+
+        sine = waveform.get_wave_form(synth.capture('sine')).data
+        square = waveform.get_wave_form(synth.capture('square')).data
+        opposite = waveform.get_wave_form(
+            synth.capture('square', phase=math.pi)).data
+
+        self.assertIsInstance(sine, waveform.PeakList)
+        self.assertTrue(waveform.is_top_sine_inside_top_square(sine, square))
+        self.assertFalse(
+            waveform.is_top_sine_inside_top_square(sine, opposite))
+        self.assertTrue(waveform.is_top_sine_inside_top_square(
+            list(sine), list(square)))
+
+    def test_shape_classifier(self):
+        """Whole periods without a clear timing are classified by the shape,
+less than two are read again"""
+
+        dots = waveform.get_wave_form(synth.capture('sine', period=2500)).data
+        self.assertEqual(waveform._get_wave_type(dots),
+                         waveform.WaveType.UNKNOWN)
+
+        for shape in ('sine', 'square'):
+            for phase in (0, math.pi):
+                with self.subTest(shape=shape, phase=phase):
+                    wave = waveform.get_wave_form(synth.capture(
+                        shape, period=2500, phase=phase, noise=10))
+                    self.assertEqual(wave.typ, waveform.WaveType.UNKNOWN)
+                    self.assertGreater(wave.confidence,
+                                       waveform.MIN_SHAPE_CONFIDENCE)
+
+        # clipped flat, the timing is neither a sine nor a square
+        data = synth.capture('sine', period=1000, clip=30, noise=30)
+        wave = waveform.get_wave_form(data)
+        self.assertEqual(waveform._get_wave_type(wave.data),
+                         waveform.WaveType.UNKNOWN)
+        self.assertEqual(waveform._get_full_periods(wave.data)[2], 3)
+        self.assertEqual(wave.typ, waveform.WaveType.SQUARE)
+
+        wave = waveform.get_wave_form(synth.capture('sine', period=5000))
+        self.assertEqual(wave.typ, waveform.WaveType.UNKNOWN)
+        wave = waveform.get_wave_form(synth.capture('sine', amplitude=10))
+        self.assertEqual(wave.typ, waveform.WaveType.UNKNOWN)
+        self.assertIsNone(wave.confidence)
+
+    def test_shape_crossings(self):
+        """A glitch through the middle lowers the shape scores"""
+
+        data = list(waveform._signed(synth.capture('sine', period=1000)))
+        dots = waveform.get_wave_form(synth.capture('sine', period=1000)).data
+        top, bottom = max(data), min(data)
+        clean = waveform._get_shape_scores(data, top, bottom, dots)
+
+        peak = data.index(top, dots.time[1])
+        data[peak:peak + 20] = [bottom] * 20
+        glitch = waveform._get_shape_scores(data, top, bottom, dots)
+
+        self.assertGreater(clean[waveform.WaveType.SINE], .9)
+        self.assertLess(glitch[waveform.WaveType.SINE],
+                        clean[waveform.WaveType.SINE] * .9)
+
+    def test_no_sine_top_end(self):
+        """Sine top does not end in the capture"""
+
+        sine = [
+            waveform.Dot(0, -80, waveform.Peak.BT_ST),
+            waveform.Dot(20, -70, waveform.Peak.BT_END),
+            waveform.Dot(40, 90, waveform.Peak.TP_ST),
+        ]
+        square = [
+            waveform.Dot(0, 90, waveform.Peak.TP_ST),
+            waveform.Dot(50, 80, waveform.Peak.TP_END),
+        ]
+        self.assertFalse(waveform.is_top_sine_inside_top_square(sine, square))
+        self.assertEqual(
+            waveform.top_sine_inside_top_square_ratio(sine, square), 0)
+
+    def test_sync_ratio(self):
+        """Every sine period is checked"""
+
+        sine = waveform.get_wave_form(synth.capture('sine')).data
+        square = waveform.get_wave_form(synth.capture('square')).data
+        opposite = waveform.get_wave_form(
+            synth.capture('square', phase=math.pi)).data
+
+        self.assertEqual(
+            waveform.top_sine_inside_top_square_ratio(sine, square), 1)
+        self.assertEqual(
+            waveform.top_sine_inside_top_square_ratio(sine, opposite), 0)
+        self.assertEqual(
+            waveform.top_sine_inside_top_square_ratio(sine, None), 0)
+
+        top = waveform.Peak.TP_ST
+        end = waveform.Peak.TP_END
+        sine = [
+            waveform.Dot(0, 90, top),       # cut by the capture start
+            waveform.Dot(10, 80, end),
+            waveform.Dot(110, 90, top),
+            waveform.Dot(120, 80, end),
+            waveform.Dot(210, 90, top),
+            waveform.Dot(220, 80, end),
+            waveform.Dot(310, 90, top),
+            waveform.Dot(320, 80, end),
+            waveform.Dot(410, 90, top),     # still open
+        ]
+        square = [
+            waveform.Dot(0, 90, top),
+            waveform.Dot(50, 80, end),
+            waveform.Dot(100, 90, top),
+            waveform.Dot(150, 80, end),
+            waveform.Dot(215, 90, top),     # late
+            waveform.Dot(250, 80, end),
+            waveform.Dot(300, 90, top),     # open until the end
+        ]
+        self.assertAlmostEqual(
+            waveform.top_sine_inside_top_square_ratio(sine, square), 2 / 3)
+
+    def test_noisy_sync(self):
+        """Noise on the square top threshold does not end the top"""
+
+        sine = synth.capture('sine', period=1200, noise=12, seed=240)
+        square = synth.capture('square', period=1200, noise=12, phase=-.1,
+                               seed=10240)
+        waves = [waveform.get_wave_form(sine), waveform.get_wave_form(square)]
+
+        # a one sample dip at 3871 ended the last top
+        self.assertEqual(waveform._top_index(waves[1].data)[2], 3620)
+        self.assertEqual(waveform.top_sine_inside_top_square_ratio(
+            waves[0].data, waves[1].data), 1)
+        self.assertEqual(judge(waves), Verdict.OK)
+
+        for seed in range(20):
+            waves = [waveform.get_wave_form(synth.capture(
+                'sine', period=1000, noise=12, seed=seed)),
+                     waveform.get_wave_form(synth.capture(
+                         'square', period=1000, noise=12, phase=.3,
+                         seed=seed + 100))]
+            with self.subTest(seed=seed):
+                self.assertEqual(judge(waves), Verdict.OK)
+
+
+@unittest.skipIf(waveform.np is None, 'numpy is not installed')
+class TestNumpyEngine(unittest.TestCase):
+    """NumPy engine parity with the pure python engine"""
+
+    def assertSameWave(self, data):
+        """Both engines give the same wave"""
+
+        expected = waveform._get_wave_form_py(data)
+        wave = waveform._get_wave_form_np(data)
+
+        self.assertEqual(wave.typ, expected.typ)
+        self.assertEqual(wave.p2p, expected.p2p)
+        self.assertEqual(wave.data, expected.data)
+
+        for avg_len in (4, 64):
+            self.assertEqual(waveform._get_wave_form_np(data, avg_len),
+                             waveform._get_wave_form_py(data, avg_len))
+
+    def test_sine_square(self):
+        """Clean and noisy waves"""
+
+        for shape in ('sine', 'square'):
+            for phase in (0, math.pi):
+                for noise in (0, 10, 40):
+                    with self.subTest(shape=shape, phase=phase, noise=noise):
+                        self.assertSameWave(synth.capture(
+                            shape, phase=phase, noise=noise, seed=noise))
+
+    def test_chatter(self):
+        """Noise on the peak thresholds"""
+
+        for seed in range(10):
+            with self.subTest(seed=seed):
+                self.assertSameWave(synth.capture(
+                    'square', period=1200, noise=25, seed=seed))
+
+    def test_clipped(self):
+        """Amplitude beyond the byte range"""
+
+        self.assertSameWave(synth.capture('sine', amplitude=300))
+        self.assertSameWave(synth.capture('square', amplitude=300, period=97))
+
+    def test_flat_and_short(self):
+        """No signal and too few samples"""
+
+        self.assertSameWave(array('B', [3]) * 100)
+        self.assertSameWave(synth.capture('sine', length=20, noise=5))
+        self.assertEqual(waveform._get_wave_form_np(array('B', [1] * 16)),
+                         waveform._get_wave_form_py(array('B', [1] * 16)))
+        self.assertEqual(waveform._get_wave_form_np(array('B')),
+                         waveform._get_wave_form_py(array('B')))
+
+
+class TestWaveAnalyzer(unittest.TestCase):
+    """Incremental analyzer"""
+
+    def feed(self, analyzer, data, seed=0):
+        """Feed data in random sized chunks"""
+
+        rnd = random.Random(seed)
+        view = memoryview(data)     # as Dso.get_sample feeds it
+        idx = 0
+        while idx < len(data):
+            size = rnd.choice((1, 5, 15, 16, 17, 100, 500))
+            analyzer.feed(view[idx:idx+size])
+            idx += size
+
+    def test_chunks(self):
+        """Chunked capture gives the same wave as the whole capture"""
+
+        for use_np in (False, True):
+            if use_np and waveform.np is None:
+                continue
+            analyzer = waveform.WaveAnalyzer()
+            analyzer._use_np = use_np
+            for shape in ('sine', 'square'):
+                for seed in range(3):
+                    with self.subTest(np=use_np, shape=shape, seed=seed):
+                        data = synth.capture(shape, noise=20, seed=seed)
+                        analyzer.reset()
+                        self.feed(analyzer, data, seed)
+                        self.assertEqual(
+                            analyzer.finish(),
+                            waveform._get_wave_form_py(data))
+
+    def test_short(self):
+        """Not enough samples"""
+
+        analyzer = waveform.WaveAnalyzer()
+        self.assertEqual(analyzer.finish().typ, waveform.WaveType.UNKNOWN)
+        analyzer.feed(array('B', [1] * 10))
+        analyzer.feed(array('B', [1] * 6))
+        self.assertIsNone(analyzer.finish().data)
+
 
 if __name__ == '__main__':
 
@@ -0,0 +1,59 @@
+"""Test verdict of a dual channel capture"""
+
+from enum import Enum
+
+import waveform
+from ng_state import NgState
+
+
+MIN_VOLT_P2P = 2.5      # volts
+MIN_SYNC_RATIO = .8     # sine tops inside the square tops
+
+
+class Verdict(Enum):
+    """Capture result, the value is the text for the operator"""
+
+    OK = 'OK'
+    NOT_SYNC = 'Not Sync'
+    LOW_VOLTAGE = 'Low voltage'
+    UNKNOWN_WAVE = 'Unknown wave'
+    NO_SINE = 'No sine wave'
+
+    @property
+    def state(self) -> NgState:
+        """NG screen status of the verdict"""
+
+        if self == Verdict.OK:
+            return NgState.OK
+        if self in (Verdict.NOT_SYNC, Verdict.LOW_VOLTAGE):
+            return NgState.NG
+        return NgState.PROGRESS     # read again
+
+
+def judge(waves: list) -> Verdict:  # waveform.Wave
+    """Judge the waves of both channels"""
+
+    sine, square = None, None
+    for wave in waves:
+        if wave.typ == waveform.WaveType.UNKNOWN:
+            return Verdict.UNKNOWN_WAVE
+
+        if wave.typ == waveform.WaveType.SINE:
+            sine = wave.data
+
+            if wave.vpp and wave.vpp < MIN_VOLT_P2P:
+                return Verdict.LOW_VOLTAGE
+
+        elif wave.typ == waveform.WaveType.SQUARE:
+            square = wave.data
+
+    if not sine:
+        return Verdict.NO_SINE
+
+    # every period, or the one after the first third like before
+    ratio = waveform.top_sine_inside_top_square_ratio(sine, square)
+    if ratio < MIN_SYNC_RATIO \
+            and not waveform.is_top_sine_inside_top_square(sine, square):
+        return Verdict.NOT_SYNC
+
+    return Verdict.OK
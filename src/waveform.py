@@ -1,10 +1,24 @@
 """Analyze wave form"""
 from array import array
-from dataclasses import dataclass
+from bisect import bisect_right
+from dataclasses import dataclass, field
 from enum import Enum
+from itertools import islice
+
+try:
+    import numpy as np
+except ImportError:     # optional, fall back to the pure python engine
+    np = None
 
 
 PERCENT_TO_PEAK = 6
+AVERAGE_LENGTH = 16     # samples of the moving average window
+
+# Share of the samples in the middle half of the range (whole periods)
+SINE_MIDDLE_RATIO = 1 / 3   # |sin| < .5 for a third of the period
+SQUARE_MIDDLE_RATIO = .1    # only the edges, smoothed by the average
+MIN_SHAPE_CONFIDENCE = .6
+MIN_SHAPE_PERIODS = 2       # whole periods to classify by the shape
 
 
 class WaveType(Enum):
@@ -25,14 +39,19 @@ class Peak(Enum):
     BT_END = 4
 
 
+_PEAKS = list(Peak)  # peak code -> Peak
+
+
 @dataclass
 class Wave:
     """Wave object"""
 
-    data: list = None   # Dot
+    data: 'PeakList' = None
     typ: WaveType = WaveType.UNKNOWN
     p2p: int = 0
     vpp: float = None
+    confidence: float = None    # of the whole capture shape
+    raw: array = field(default=None, repr=False, compare=False)  # samples
 
 
 @dataclass
@@ -44,30 +63,149 @@ class Dot:
     peak: Peak = Peak.UNKNOWN
 
 
-def is_top_sine_inside_top_square(sine: list, square: list):
+class DotView:
+    """Read only dot of a PeakList"""
+
+    __slots__ = ('_peaks', '_idx')
+
+    def __init__(self, peaks: 'PeakList', idx: int) -> None:
+
+        self._peaks = peaks
+        self._idx = idx
+
+    @property
+    def time(self) -> int:
+        """Sample index"""
+        return self._peaks.time[self._idx]
+
+    @property
+    def val(self) -> int:
+        """Smoothed sample value"""
+        return self._peaks.val[self._idx]
+
+    @property
+    def peak(self) -> Peak:
+        """Peak state"""
+        return _PEAKS[self._peaks.peak[self._idx]]
+
+    def __eq__(self, other) -> bool:
+
+        try:
+            return (self.time, self.val, self.peak) \
+                == (other.time, other.val, other.peak)
+        except AttributeError:
+            return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+
+        return 'Dot(time={}, val={}, peak={!r})'.format(
+            self.time, self.val, self.peak)
+
+
+class PeakList:
+    """Peaks in parallel columns
+time and val are array('i'), peak is array('B') of Peak values.
+Indexing gives a DotView, slicing gives a PeakList."""
+
+    __slots__ = ('time', 'val', 'peak')
+
+    def __init__(self, dots: list = None) -> None:
+
+        self.time = array('i')
+        self.val = array('i')
+        self.peak = array('B')
+        for dot in dots or ():
+            self.append(dot.time, dot.val, dot.peak.value)
+
+    def append(self, time: int, val: int, peak: int) -> None:
+        """Add a dot, peak is a Peak value"""
+
+        self.time.append(time)
+        self.val.append(val)
+        self.peak.append(peak)
+
+    def pop(self) -> None:
+        """Remove the last dot"""
+
+        self.time.pop()
+        self.val.pop()
+        self.peak.pop()
+
+    def __len__(self) -> int:
+
+        return len(self.peak)
+
+    def __getitem__(self, idx):
+
+        if isinstance(idx, slice):
+            out = PeakList()
+            out.time = self.time[idx]
+            out.val = self.val[idx]
+            out.peak = self.peak[idx]
+            return out
+
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError('PeakList index out of range')
+
+        return DotView(self, idx)
+
+    def __iter__(self):
+
+        for idx in range(len(self)):
+            yield DotView(self, idx)
+
+    def __eq__(self, other) -> bool:
+
+        if isinstance(other, PeakList):
+            return self.time == other.time and self.val == other.val \
+                and self.peak == other.peak
+
+        try:
+            return len(self) == len(other) \
+                and all(dot == oth for dot, oth in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+
+        return 'PeakList({})'.format(list(self))
+
+
+def is_top_sine_inside_top_square(sine: PeakList, square: PeakList):
     """Find the top sine inside top square"""
 
     if not sine or not square:
         return False
 
-    top_start_sine_dot = None
-    top_end_sine_dot = None
-    for dot in sine[int(len(sine)/3):]:
-        if dot.peak == Peak.TP_ST and not top_start_sine_dot:
-            top_start_sine_dot = dot
+    sine, square = _as_peak_list(sine), _as_peak_list(square)
+
+    top_start_sine = None
+    top_end_sine = None
+    for idx in range(int(len(sine)/3), len(sine)):
+        code = sine.peak[idx]
+        if code == Peak.TP_ST.value and top_start_sine is None:
+            top_start_sine = sine.time[idx]
 
-        if dot.peak == Peak.TP_END and top_start_sine_dot:
-            top_end_sine_dot = dot
+        if code == Peak.TP_END.value and top_start_sine is not None:
+            top_end_sine = sine.time[idx]
             break
 
-    for idx, dot in enumerate(square):
+    if top_end_sine is None:
+        return False
+
+    for idx, code in enumerate(square.peak):
 
-        if dot.peak == Peak.TP_END \
-                 and dot.time > top_end_sine_dot.time \
-                 and dot.time > top_start_sine_dot.time:
+        if code == Peak.TP_END.value \
+                 and square.time[idx] > top_end_sine \
+                 and square.time[idx] > top_start_sine:
 
-            top_start_dot = square[idx - 1]
-            if top_start_dot.time < top_start_sine_dot.time:
+            if square.time[idx - 1] < top_start_sine:
                 return True
 
             break
@@ -75,13 +213,63 @@ def is_top_sine_inside_top_square(sine: list, square: list):
     return False
 
 
-def has_signal(data: array) -> bool:
+def top_sine_inside_top_square_ratio(sine: PeakList,
+                                     square: PeakList) -> float:
+    """Ratio of the sine tops that are inside a top of the square
+Every complete sine top of the capture is checked against a time index
+of the square tops, 1.0 means all periods are in sync."""
+
+    if not sine or not square:
+        return 0.0
+
+    starts, ends, open_start = _top_index(_as_peak_list(square))
+    sine_starts, sine_ends, _ = _top_index(_as_peak_list(sine))
+
+    passed, checked = 0, 0
+    for start, end in zip(sine_starts, sine_ends):
+        if start == 0:
+            continue    # cut by the start of the capture
+
+        # the first square top that ends after the sine top
+        idx = bisect_right(ends, end)
+        if idx < len(ends):
+            square_start = starts[idx]
+        else:
+            square_start = open_start
+
+        checked += 1
+        if square_start is not None and square_start < start:
+            passed += 1
+
+    if not checked:
+        return 0.0
+
+    return passed / checked
+
+
+def _top_index(peaks: PeakList):
+    """Start and end times of the complete tops, start of the open top"""
+
+    starts, ends = array('i'), array('i')
+    start = None
+    for idx, code in enumerate(peaks.peak):
+        if code == Peak.TP_ST.value:
+            start = peaks.time[idx]
+        elif code == Peak.TP_END.value and start is not None:
+            starts.append(start)
+            ends.append(peaks.time[idx])
+            start = None
+
+    return starts, ends, start
+
+
+def has_signal(data: array, avg_len: int = AVERAGE_LENGTH) -> bool:
     """data is straight line"""
 
     if len(data) == 0:
         return False
 
-    data = _average(data)
+    data = _average(data, avg_len)
     top, bottom = _get_top_bottom(data)
 
     diff = top - bottom
@@ -93,66 +281,340 @@ def has_signal(data: array) -> bool:
     return True
 
 
-def get_wave_form(unsigned_data: array) -> Wave:
+def get_wave_form(unsigned_data: array,
+                  avg_len: int = AVERAGE_LENGTH) -> Wave:
     """Get time and peak state"""
 
-    data = _conv_sign(unsigned_data)
-    data = _average(data)
+    if np is not None:
+        return _get_wave_form_np(unsigned_data, avg_len)
+
+    return _get_wave_form_py(unsigned_data, avg_len)
+
+
+class WaveAnalyzer:
+    """Incremental get_wave_form
+Feed the unsigned sample chunks while they arrive. The moving average
+window and the top / bottom are carried across the chunks, finish()
+only has to run the peak state machine over the smoothed data, because
+its thresholds depend on the top / bottom of the whole capture."""
+
+    def __init__(self, avg_len: int = AVERAGE_LENGTH) -> None:
+
+        self.avg_len = avg_len
+        self._use_np = np is not None
+        self.reset()
+
+    def reset(self) -> None:
+        """Start a new capture"""
+
+        self._chunks = []
+        self._top, self._bottom = None, None
+        if self._use_np:
+            self._tail = np.empty(0, dtype=np.int8)
+        else:
+            self._tail = array('b')
+
+    def feed(self, unsigned_chunk: array) -> None:
+        """Add a chunk of the capture"""
+
+        if self._use_np:
+            buf = np.concatenate(
+                    (self._tail, np.frombuffer(unsigned_chunk, np.int8)))
+            data = _average_np(buf, self.avg_len)
+            self._tail = buf[-self.avg_len:]
+            if len(data) == 0:
+                return
+            top, bottom = int(data.max()), int(data.min())
+        else:
+            buf = array('b', self._tail)
+            buf.frombytes(unsigned_chunk)   # reinterpreted as signed
+            data = _average(buf, self.avg_len)
+            self._tail = buf[-self.avg_len:]
+            if len(data) == 0:
+                return
+            top, bottom = _get_top_bottom(data)
+
+        if self._top is None or top > self._top:
+            self._top = top
+        if self._bottom is None or bottom < self._bottom:
+            self._bottom = bottom
+        self._chunks.append(data)
+
+    def finish(self) -> Wave:
+        """Wave of the fed capture"""
+
+        if not self._chunks:
+            return Wave(None, WaveType.UNKNOWN)
+
+        if self._use_np:
+            data = np.concatenate(self._chunks)
+            dots = _find_dots_np(data, self._top, self._bottom,
+                                 self.avg_len)
+        else:
+            data = array('b')
+            for chunk in self._chunks:
+                data.extend(chunk)
+            dots = _find_dots(data, self._top, self._bottom, self.avg_len)
+
+        return _make_wave(dots, data, self._top, self._bottom)
+
+
+def _get_wave_form_py(unsigned_data: array,
+                      avg_len: int = AVERAGE_LENGTH) -> Wave:
+    """Pure python engine"""
+
+    data = _signed(unsigned_data)
+    data = _average(data, avg_len)
     if len(data) == 0:
         return Wave(None, WaveType.UNKNOWN)
 
     top, bottom = _get_top_bottom(data)
+
+    return _make_wave(_find_dots(data, top, bottom, avg_len),
+                      data, top, bottom)
+
+
+def _get_wave_form_np(unsigned_data: array,
+                      avg_len: int = AVERAGE_LENGTH) -> Wave:
+    """NumPy engine, same result as _get_wave_form_py"""
+
+    data = _average_np(np.frombuffer(unsigned_data, np.int8), avg_len)
+    if len(data) == 0:
+        return Wave(None, WaveType.UNKNOWN)
+
+    top, bottom = int(data.max()), int(data.min())
+
+    return _make_wave(_find_dots_np(data, top, bottom, avg_len),
+                      data, top, bottom)
+
+
+def _make_wave(dots: PeakList, data: array, top: int, bottom: int) -> Wave:
+    """Wave of the smoothed data and its peaks
+The timing of the last full wave decides the type, the shape of the
+whole capture decides when the timing does not. Less than
+MIN_SHAPE_PERIODS whole periods stay UNKNOWN to be read again, a
+verdict must not come from a shape guess."""
+
+    wave = Wave(dots, _get_wave_type(dots), _peak_to_peak(dots))
+    if _is_small_signal(dots):
+        return wave
+
+    scores = _get_shape_scores(data, top, bottom, dots)
+    if wave.typ == WaveType.UNKNOWN \
+            and _get_full_periods(dots)[2] >= MIN_SHAPE_PERIODS:
+        typ = max(scores, key=scores.get)
+        if scores[typ] >= MIN_SHAPE_CONFIDENCE:
+            wave.typ = typ
+
+    wave.confidence = scores.get(wave.typ, max(scores.values()))
+
+    return wave
+
+
+def _get_shape_scores(data: array, top: int, bottom: int,
+                      dots: PeakList) -> dict:
+    """Score (0 - 1) of each wave type from the whole capture
+A sine stays in the middle half of its range for a third of the time,
+a square only while it is switching. Both cross the middle half twice
+a period, extra or missing crossings (a glitch, a lost edge) lower
+both scores."""
+
+    scores = {WaveType.SINE: 0.0, WaveType.SQUARE: 0.0}
+    begin, end, periods = _get_full_periods(dots)
+    if end <= begin:
+        return scores
+
+    quarter = (top - bottom) / 4
+    low, high = bottom + quarter, top - quarter
+    if np is not None and isinstance(data, np.ndarray):
+        part = data[begin:end]
+        middle = int(np.count_nonzero((part > low) & (part < high)))
+        # sides outside the middle half, the crossings are the changes
+        sides = part[(part >= high) | (part <= low)] >= high
+        crossings = int(np.count_nonzero(sides[1:] != sides[:-1]))
+    else:
+        middle = 0
+        crossings = 0
+        side = None
+        for val in islice(data, begin, end):
+            if low < val < high:
+                middle += 1
+                continue
+            if side is not None and (val >= high) != side:
+                crossings += 1
+            side = val >= high
+    ratio = middle / (end - begin)
+    expected = 2 * periods
+    regularity = min(crossings, expected) / max(crossings, expected, 1)
+
+    span = SINE_MIDDLE_RATIO - SQUARE_MIDDLE_RATIO
+    sine = 1 - abs(ratio - SINE_MIDDLE_RATIO) / span
+    square = (SINE_MIDDLE_RATIO - ratio) / span
+    scores[WaveType.SINE] = max(0.0, min(1.0, sine)) * regularity
+    scores[WaveType.SQUARE] = max(0.0, min(1.0, square)) * regularity
+
+    return scores
+
+
+def _get_full_periods(dots: PeakList) -> tuple:
+    """Time range (begin, end) of the whole periods in the capture and
+their count"""
+
+    for code in (Peak.TP_ST.value, Peak.BT_ST.value):
+        times = [dots.time[idx] for idx, peak in enumerate(dots.peak)
+                 if peak == code and dots.time[idx] > 0]
+        if len(times) > 1:
+            return times[0], times[-1], len(times) - 1
+
+    return 0, 0, 0
+
+
+def _get_areas(top: int, bottom: int):
+    """Thresholds of the top and bottom peak areas"""
+
     margin = ((top - bottom) * PERCENT_TO_PEAK) / 100
-    top_area = top - margin
-    bottom_area = bottom + margin
+
+    return top - margin, bottom + margin
+
+
+def _find_dots(data: array, top: int, bottom: int,
+               gap: int = AVERAGE_LENGTH) -> PeakList:
+    """Peak state machine
+A peak left for less than gap samples goes on, it is noise on the
+threshold (e.g. of a flat square top), not the end of the peak."""
+
+    top_area, bottom_area = _get_areas(top, bottom)
+    tp_st, tp_end = Peak.TP_ST.value, Peak.TP_END.value
+    bt_st, bt_end = Peak.BT_ST.value, Peak.BT_END.value
 
     first_dat = data[0]
-    dot = Dot(0, first_dat)
+    state = Peak.UNKNOWN.value
     if first_dat > top_area:
-        dot.peak = Peak.TP_ST
+        state = tp_st
     elif first_dat < bottom_area:
-        dot.peak = Peak.BT_ST
+        state = bt_st
 
-    dots = [dot]
+    dots = PeakList()
+    dots.append(0, first_dat, state)
     for idx, val in enumerate(data):
 
-        prev_dot = dots[-1]
+        if state == tp_st and val < top_area:
+            state = tp_end
+            dots.append(idx, val, state)
+            continue
+
+        if state == tp_end and val < bottom_area:
+            state = bt_st
+            dots.append(idx, val, state)
+            continue
 
-        if prev_dot.peak == Peak.TP_ST and val < top_area:
-            dot = Dot(idx, val, Peak.TP_END)
-            dots.append(dot)
+        if state == tp_end and val > top_area and idx - dots.time[-1] < gap:
+            state = tp_st
+            dots.pop()
             continue
 
-        if prev_dot.peak == Peak.TP_END and val < bottom_area:
-            dot = Dot(idx, val, Peak.BT_ST)
-            dots.append(dot)
+        if state == bt_st and val > bottom_area:
+            state = bt_end
+            dots.append(idx, val, state)
             continue
 
-        if prev_dot.peak == Peak.BT_ST and val > bottom_area:
-            dot = Dot(idx, val, Peak.BT_END)
-            dots.append(dot)
+        if state == bt_end and val > top_area:
+            state = tp_st
+            dots.append(idx, val, state)
             continue
 
-        if prev_dot.peak == Peak.BT_END and val > top_area:
-            dot = Dot(idx, val, Peak.TP_ST)
-            dots.append(dot)
+        if state == bt_end and val < bottom_area \
+                and idx - dots.time[-1] < gap:
+            state = bt_st
+            dots.pop()
             continue
 
-        if prev_dot.peak == Peak.UNKNOWN:
+        if state == Peak.UNKNOWN.value:
             if val > top_area:
-                dot = Dot(idx, val, Peak.TP_ST)
-                dots.append(dot)
+                state = tp_st
+                dots.append(idx, val, state)
                 continue
 
             if val < bottom_area:
-                dot = Dot(idx, val, Peak.BT_ST)
-                dots.append(dot)
+                state = bt_st
+                dots.append(idx, val, state)
                 continue
 
-    return Wave(dots, _get_wave_type(dots), _peak_to_peak(dots))
+    return dots
+
+
+def _find_dots_np(data, top: int, bottom: int,
+                  gap: int = AVERAGE_LENGTH) -> PeakList:
+    """Peak state machine, one search per peak instead of per sample"""
+
+    top_area, bottom_area = _get_areas(top, bottom)
+
+    # indexes where each peak state moves on to the next one
+    above_top = np.flatnonzero(data > top_area)
+    below_bottom = np.flatnonzero(data < bottom_area)
+    edges = {
+        Peak.TP_ST.value: (np.flatnonzero(data < top_area),
+                           Peak.TP_END.value),
+        Peak.TP_END.value: (below_bottom, Peak.BT_ST.value),
+        Peak.BT_ST.value: (np.flatnonzero(data > bottom_area),
+                           Peak.BT_END.value),
+        Peak.BT_END.value: (above_top, Peak.TP_ST.value),
+    }
+    # peak ends that go back into the peak unless the next one comes first
+    chatter = {
+        Peak.TP_END.value: (above_top, below_bottom, Peak.TP_ST.value),
+        Peak.BT_END.value: (below_bottom, above_top, Peak.BT_ST.value),
+    }
+
+    first_dat = int(data[0])
+    state = Peak.UNKNOWN.value
+    if first_dat > top_area:
+        state = Peak.TP_ST.value
+    elif first_dat < bottom_area:
+        state = Peak.BT_ST.value
+
+    dots = PeakList()
+    dots.append(0, first_dat, state)
+    idx = 0
+    if state == Peak.UNKNOWN.value:
+        top_idx = above_top[0] if len(above_top) else len(data)
+        bottom_idx = below_bottom[0] if len(below_bottom) else len(data)
+        if top_idx < bottom_idx:
+            idx, state = int(top_idx), Peak.TP_ST.value
+        elif bottom_idx < top_idx:
+            idx, state = int(bottom_idx), Peak.BT_ST.value
+        else:
+            return dots
+        dots.append(idx, int(data[idx]), state)
+
+    while True:
+        indexes, state = edges[state]
+        pos = np.searchsorted(indexes, idx, side='right')
+        if pos >= len(indexes):
+            break
+
+        idx = int(indexes[pos])
+        if state in chatter:
+            back, onward, peak = chatter[state]
+            back_idx = _next_index(back, idx, len(data))
+            if back_idx - idx < gap \
+                    and back_idx < _next_index(onward, idx, len(data)):
+                idx, state = back_idx, peak
+                continue
+        dots.append(idx, int(data[idx]), state)
+
+    return dots
+
+
+def _next_index(indexes, idx: int, default: int) -> int:
+    """First of the sorted indexes after idx"""
+
+    pos = np.searchsorted(indexes, idx, side='right')
 
+    return int(indexes[pos]) if pos < len(indexes) else default
 
-def _get_wave_type(dots: list) -> Wave:
+
+def _get_wave_type(dots: PeakList) -> WaveType:
     wave_type = WaveType.UNKNOWN
 
     # get sample full wave
@@ -168,17 +630,16 @@ def _get_wave_type(dots: list) -> Wave:
     return wave_type
 
 
-def _is_small_signal(dots: list) -> bool:
+def _is_small_signal(dots: PeakList) -> bool:
 
     return _peak_to_peak(dots) < 40
 
 
-def _peak_to_peak(dots: list) -> int:
+def _peak_to_peak(dots: PeakList) -> int:
 
-    vals = [dot.val for dot in dots]
-    top, bottom = _get_top_bottom(vals)
+    vals = _as_peak_list(dots).val
 
-    return abs(top - bottom)
+    return abs(max(vals) - min(vals))
 
 
 def _is_sine_wave(dots: list) -> bool:
@@ -205,58 +666,67 @@ dots start with TP_ST and TP_END should be appeared after 80% of the half wave
     return top_end_time < dots[1].time
 
 
-def _get_last_wave(data: list) -> list:
+def _get_last_wave(data: PeakList) -> PeakList:
     """Get the last full wave that should not have the noise"""
 
-    out = []
-    for idx, dot in enumerate(reversed(data)):
-        if dot.peak == Peak.BT_END:
-            end_idx = len(data) - idx
+    data = _as_peak_list(data)
+    for idx in range(len(data) - 1, -1, -1):
+        if data.peak[idx] == Peak.BT_END.value:
+            end_idx = idx + 1
             start_idx = end_idx - 4
-            out = data[start_idx:end_idx]
-            break
+            return data[start_idx:end_idx]
 
-    return out
+    return PeakList()
 
 
-def _conv_sign(data: array) -> array:
-    """Convert array('B') to array('b')"""
+def _as_peak_list(dots) -> PeakList:
+    """PeakList of a list of Dot"""
 
-    out = array('b')
-    for dat in data:
-        out.append(_one_byte_sign(dat))
+    if isinstance(dots, PeakList):
+        return dots
 
-    return out
+    return PeakList(dots)
 
 
-def _average(data: array, avg_len: int = 16) -> array:
-    """Make signal more smooth to avoid noise"""
+def _signed(data: array) -> memoryview:
+    """Signed view of array('B') without copying"""
 
-    out = array(data.typecode)
-    if len(data) <= avg_len:
-        return out
+    return memoryview(data).cast('b')
 
-    for idx in range(avg_len, len(data)):
-        summary = 0
-        for dat in data[idx-avg_len:idx]:
-            summary += dat
-        out.append(int(summary / avg_len))
 
-    return out
+def _average(data: array, avg_len: int = AVERAGE_LENGTH) -> array:
+    """Make signal more smooth to avoid noise
+The output point at idx is the mean of the avg_len samples before idx,
+kept as a running sum so the cost does not depend on avg_len"""
+
+    if isinstance(data, memoryview):
+        typecode = data.format
+    else:
+        typecode = data.typecode
+
+    count = len(data) - avg_len
+    if count <= 0:
+        return array(typecode)
 
+    out = array(typecode, [0]) * count
+    summary = sum(islice(data, avg_len))
+    for idx, (new, old) in enumerate(zip(islice(data, avg_len, None), data)):
+        out[idx] = int(summary / avg_len)
+        summary += new - old
+
+    return out
 
-def _one_byte_sign(num: int) -> int:
-    """Convert unsigned byte to signed byte"""
 
-    if num < 128:
-        return num
+def _average_np(data, avg_len: int = AVERAGE_LENGTH):
+    """_average with numpy, int8 in and int64 out"""
 
-    if num > 255:
-        num &= 0xFF
+    if len(data) <= avg_len:
+        return np.empty(0, dtype=np.int64)
 
-    out = 128 - (num & 0x7F)
+    summary = np.concatenate(([0], np.cumsum(data, dtype=np.int64)))
 
-    return out * -1
+    return ((summary[avg_len:-1] - summary[:-avg_len-1]) / avg_len) \
+        .astype(np.int64)
 
 
 def _get_top_bottom(data: array):